@@ -35,6 +35,7 @@ from time import sleep
 import random
 import copy
 import collections
+import itertools
 import numbers
 
 
@@ -125,11 +126,14 @@ class Environment:
     The environment keeps a list of .things and .agents (which is a subset
     of .things). Each agent has a .performance slot, initialized to 0.
     Each thing has a .location slot, even though some environments may not
-    need this."""
+    need this. The things are also indexed by location in .thing_index, so
+    list_things_at is a dict lookup; code that relocates a thing should do it
+    through move_to (or delete and re-add it) to keep the index current."""
 
     def __init__(self):
         self.things = []
         self.agents = []
+        self.thing_index = {}
 
     def thing_classes(self):
         return []  # List of classes that can go into environment
@@ -179,11 +183,8 @@ class Environment:
 
     def list_things_at(self, location, tclass=Thing):
         """Return all things exactly at a given location."""
-        if isinstance(location, numbers.Number):
-            return [thing for thing in self.things
-                    if thing.location == location and isinstance(thing, tclass)]
-        return [thing for thing in self.things
-                if all(x == y for x, y in zip(thing.location, location)) and isinstance(thing, tclass)]
+        return [thing for thing in self.thing_index.get(location_key(location), ())
+                if isinstance(thing, tclass)]
 
     def some_things_at(self, location, tclass=Thing):
         """Return true if at least one of the things at location
@@ -201,6 +202,7 @@ class Environment:
         else:
             thing.location = location if location is not None else self.default_location(thing)
             self.things.append(thing)
+            self.index_thing(thing)
             if isinstance(thing, Agent):
                 thing.performance = 0
                 self.agents.append(thing)
@@ -214,9 +216,35 @@ class Environment:
             print("  in Environment delete_thing")
             print("  Thing to be removed: {} at {}".format(thing, thing.location))
             print("  from list: {}".format([(thing, thing.location) for thing in self.things]))
+        else:
+            self.unindex_thing(thing)
         if thing in self.agents:
             self.agents.remove(thing)
 
+    def index_thing(self, thing):
+        """Record thing under its current location. Subclasses that keep more
+        indexes extend this and unindex_thing."""
+        self.thing_index.setdefault(location_key(thing.location), []).append(thing)
+
+    def unindex_thing(self, thing):
+        """Remove thing from the location index."""
+        key = location_key(thing.location)
+        things = self.thing_index.get(key)
+        if things is None or thing not in things:
+            # the location was changed without move_to; find it the slow way
+            key, things = next((k, ts) for k, ts in self.thing_index.items() if thing in ts)
+        things.remove(thing)
+        if not things:
+            del self.thing_index[key]
+
+
+def location_key(location):
+    """Return a hashable form of location: numbers as they are, (x, y)
+    sequences such as lists as tuples."""
+    if isinstance(location, numbers.Number):
+        return location
+    return tuple(location)
+
 
 class Direction:
     """A direction class for agents that want to move in a 2D plane
@@ -308,10 +336,17 @@ class XYEnvironment(Environment):
     Agents perceive things within a radius. Each agent in the
     environment has a .location slot which should be a location such
     as (0, 1), and a .holding slot, which should be a list of things
-    that are held."""
+    that are held.
+
+    For radius queries the things are also kept in a bucketed grid: .buckets
+    maps (x // bucket_size, y // bucket_size) to the things in that square,
+    so things_near only looks at the buckets the radius overlaps."""
+
+    bucket_size = 4
 
     def __init__(self, width=10, height=10):
         super().__init__()
+        self.buckets = {}
 
         self.width = width
         self.height = height
@@ -323,14 +358,39 @@ class XYEnvironment(Environment):
 
     perceptible_distance = 1
 
+    def bucket_of(self, location):
+        """Return the key of the bucket that location falls in."""
+        return int(location[0] // self.bucket_size), int(location[1] // self.bucket_size)
+
+    def index_thing(self, thing):
+        super().index_thing(thing)
+        self.buckets.setdefault(self.bucket_of(thing.location), []).append(thing)
+
+    def unindex_thing(self, thing):
+        super().unindex_thing(thing)
+        key = self.bucket_of(thing.location)
+        things = self.buckets.get(key)
+        if things is None or thing not in things:
+            key, things = next((k, ts) for k, ts in self.buckets.items() if thing in ts)
+        things.remove(thing)
+        if not things:
+            del self.buckets[key]
+
     def things_near(self, location, radius=None):
         """Return all things within radius of location."""
         if radius is None:
             radius = self.perceptible_distance
         radius2 = radius * radius
-        return [(thing, radius2 - distance_squared(location, thing.location))
-                for thing in self.things if distance_squared(
-                location, thing.location) <= radius2]
+        x0, y0 = self.bucket_of((location[0] - radius, location[1] - radius))
+        x1, y1 = self.bucket_of((location[0] + radius, location[1] + radius))
+        near = []
+        for bx in range(x0, x1 + 1):
+            for by in range(y0, y1 + 1):
+                for thing in self.buckets.get((bx, by), ()):
+                    d2 = distance_squared(location, thing.location)
+                    if d2 <= radius2:
+                        near.append((thing, radius2 - d2))
+        return near
 
     def percept(self, agent):
         """By default, agent perceives things within a default radius."""
@@ -368,7 +428,9 @@ class XYEnvironment(Environment):
         If thing is holding anything, they move with him."""
         thing.bump = self.some_things_at(destination, Obstacle)
         if not thing.bump:
+            self.unindex_thing(thing)
             thing.location = destination
+            self.index_thing(thing)
             for o in self.observers:
                 o.thing_moved(thing)
             for t in thing.holding:
@@ -457,20 +519,101 @@ class Dirt(Thing):
     pass
 
 
+# source of VacuumEnvironment.wall_version and dirt_version
+map_versions = itertools.count()
+# bytes.translate table mapping a cell count to 1 if it is nonzero, 0 otherwise
+occupied = bytes([0] + [1] * 255)
+
+
 class VacuumEnvironment(XYEnvironment):
     """The environment of [Ex. 2.12]. Agent perceives dirty or clean,
     and bump (into obstacle) or not; 2D discrete world of unknown size;
     performance measure is 100 for each dirt cleaned, and -1 for
-    each turn taken."""
+    each turn taken.
+
+    Besides the list of things, the environment keeps two occupancy grids,
+    wall_grid and dirt_grid: bytearrays of width * height cells (cell (x, y)
+    is at index y * width + x) counting the walls and dirt in each cell.
+    They are kept in sync by add_thing, delete_thing and move_to (through
+    index_thing and unindex_thing), so planners can test a cell with one
+    array lookup instead of scanning self.things.
+
+    wall_version and dirt_version change whenever a wall, resp. some dirt,
+    is added, removed or moved. They are drawn from map_versions, shared by
+    all environments, so a (wall_version, dirt_version) pair identifies one
+    map and planners can key caches on it."""
 
     def __init__(self, width=10, height=10):
         super().__init__(width, height)
+        self.wall_grid = bytearray(width * height)
+        self.dirt_grid = bytearray(width * height)
+        self.wall_version = next(map_versions)
+        self.dirt_version = next(map_versions)
 
         self.add_walls()
 
     def thing_classes(self):
         return [Wall, Dirt]
 
+    def cell_index(self, location):
+        """Return the index of location in the occupancy grids, or None if
+        it lies outside the grid."""
+        x, y = location[0], location[1]
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def update_grids(self, thing, inc):
+        """Add inc to the occupancy count of thing's cell, and give that grid
+        a new version, if thing is a Wall or Dirt."""
+        if isinstance(thing, Wall):
+            grid = self.wall_grid
+            self.wall_version = next(map_versions)
+        elif isinstance(thing, Dirt):
+            grid = self.dirt_grid
+            self.dirt_version = next(map_versions)
+        else:
+            return
+        i = self.cell_index(thing.location)
+        if i is not None:
+            grid[i] += inc
+
+    def load_grids(self, walls, dirt):
+        """Replace all the walls and dirt with a Wall in each cell where walls
+        is nonzero and a Dirt in each cell where dirt is, walls and dirt being
+        sequences of width * height cells laid out like wall_grid (bytes, for
+        instance). The things, their indexes and the grids are built in bulk,
+        so for a large map this is much quicker than add_thing; the observers
+        are not told. Agents stay where they are."""
+        width = self.width
+        self.things = [thing for thing in self.things if isinstance(thing, Agent)]
+        self.thing_index = {}
+        self.buckets = {}
+        for agent in self.things:
+            self.index_thing(agent)
+        # in place, as planners keep a reference to the grids
+        self.wall_grid[:] = bytes(walls).translate(occupied)
+        self.dirt_grid[:] = bytes(dirt).translate(occupied)
+        size = self.bucket_size
+        for kind, grid in ((Wall, self.wall_grid), (Dirt, self.dirt_grid)):
+            cells = list(itertools.compress(range(len(grid)), grid))
+            things = [kind() for _ in cells]
+            for thing, i in zip(things, cells):
+                x, y = thing.location = (i % width, i // width)
+                self.thing_index.setdefault(thing.location, []).append(thing)
+                self.buckets.setdefault((x // size, y // size), []).append(thing)
+            self.things.extend(things)
+        self.wall_version = next(map_versions)
+        self.dirt_version = next(map_versions)
+
+    def index_thing(self, thing):
+        super().index_thing(thing)
+        self.update_grids(thing, +1)
+
+    def unindex_thing(self, thing):
+        super().unindex_thing(thing)
+        self.update_grids(thing, -1)
+
     def percept(self, agent):
         """The percept is a tuple of ('Dirty' or 'Clean', 'Bump' or 'None').
         , location is NOT perceived."""
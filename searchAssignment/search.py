@@ -6,8 +6,11 @@ then create problem instances and solve them with calls to the various search
 functions.
 """
 
+import heapq
+import multiprocessing
 import sys
-from collections import deque
+import time
+import weakref
 
 from utils import *
 
@@ -63,15 +66,32 @@ class Problem:
 
 # ______________________________________________________________________________
 
+
+def state_key(state):
+    """Return a hashable key for state: the state itself if it is hashable,
+    otherwise (e.g. for [x, y] list states) the tuple of its elements."""
+    try:
+        hash(state)
+        return state
+    except TypeError:
+        return tuple(state)
+
+
 class Node:
     """A node in a search tree. Contains a pointer to the parent (the node
     that this is a successor of) and to the actual state for this node. Note
     that if a state is arrived at by two paths, then there are two nodes with
     the same state. Also includes the action that got us to this state, and
-    the total path_cost (also known as g) to reach the node. Other functions
-    may add an f and h value; see best_first_graph_search and astar_search for
-    an explanation of how the f and h values are handled. You will not need to
-    subclass this class."""
+    the total path_cost (also known as g) to reach the node. The f and h
+    fields start out as None; the searches fill them in through cache_f and
+    cache_h, see best_first_graph_search and astar_search. The node's key is
+    its state in hashable form (see state_key); it is computed once here so
+    the search functions can use it for their explored sets and frontiers.
+    Nodes have __slots__, since the searches create a great many of them;
+    other attributes cannot be added to them.
+    You will not need to subclass this class."""
+
+    __slots__ = ('state', 'parent', 'action', 'path_cost', 'depth', 'key', 'f', 'h')
 
     def __init__(self, state, parent=None, action=None, path_cost=0):
         """Create a search tree Node, derived from a parent by an action."""
@@ -79,9 +99,10 @@ class Node:
         self.parent = parent
         self.action = action
         self.path_cost = path_cost
-        self.depth = 0
-        if parent:
-            self.depth = parent.depth + 1
+        self.key = state_key(state)
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.f = None
+        self.h = None
 
     def __repr__(self):
         return "<Node {}>".format(self.state)
@@ -97,7 +118,7 @@ class Node:
     def child_node(self, problem, action):
         """[Figure 3.10]"""
         next_state = problem.result(self.state, action)
-        pathCost = problem.path_cost(self, self.state, action, next_state)
+        pathCost = problem.path_cost(self.path_cost, self.state, action, next_state)
         next_node = Node(next_state, self, action, pathCost)
         return next_node
 
@@ -109,7 +130,7 @@ class Node:
     def path(self):
         """Return a list of nodes forming the path from the root to this node."""
         node, path_back = self, []
-        while node:
+        while node is not None:
             path_back.append(node)
             node = node.parent
         return list(reversed(path_back))
@@ -127,42 +148,174 @@ class Node:
         # stored in the node instead of the node
         # object itself to quickly search a node
         # with the same state in a Hash Table
-        return hash(self.state)
+        return hash(self.key)
+
+
+def cache_f(f):
+    """Wrap f so that it is computed once per node and kept in node.f."""
+    def cached(node):
+        if node.f is None:
+            node.f = f(node)
+        return node.f
+    return cached
+
+
+def cache_h(h):
+    """Wrap h so that it is computed once per node and kept in node.h."""
+    def cached(node):
+        if node.h is None:
+            node.h = h(node)
+        return node.h
+    return cached
 
 
 # ______________________________________________________________________________
 
+def node_from_actions(problem, actions):
+    """Return the Node reached by applying actions in turn from
+    problem.initial."""
+    node = Node(problem.initial)
+    for action in actions:
+        node = node.child_node(problem, action)
+    return node
+
+
+class SearchStats:
+    """Counters a search fills in when it is passed one as stats: the nodes
+    expanded and generated, the children dropped as duplicates because their
+    state was already explored or on the frontier, the largest size the
+    frontier reached and the number of calls to the heuristic. Each search
+    decides what its frontier is; see its docstring. times maps the name of
+    a phase to the seconds spent in it; it is only filled in when profile is
+    true, by whoever runs the search (see ProfiledProblem). A search given no
+    stats counts nothing, so it pays nothing for them."""
+
+    counters = ('expanded', 'generated', 'duplicates', 'peak_frontier', 'heuristic_calls')
+
+    def __init__(self, profile=False):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.peak_frontier = 0
+        self.heuristic_calls = 0
+        self.profile = profile
+        self.times = {}
+
+    def __repr__(self):
+        return "<SearchStats {}>".format(' '.join('{}={}'.format(name, getattr(self, name))
+                                                  for name in self.counters))
+
+    def frontier(self, size):
+        """Record that the frontier holds size entries."""
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+
+    def counted(self, h):
+        """Return h, wrapped so that its calls are counted."""
+        def counted_h(node):
+            self.heuristic_calls += 1
+            return h(node)
+        return counted_h
+
+    def add_time(self, phase, seconds):
+        self.times[phase] = self.times.get(phase, 0) + seconds
+
+    def merge(self, other):
+        """Add the counts and times of the SearchStats other to these."""
+        for name in self.counters:
+            if name != 'peak_frontier':
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.frontier(other.peak_frontier)
+        for phase, seconds in other.times.items():
+            self.add_time(phase, seconds)
+
+    def as_dict(self):
+        """The counters, and the time of each phase as 'time_<phase>'."""
+        stats = {name: getattr(self, name) for name in self.counters}
+        stats.update(('time_' + phase, seconds) for phase, seconds in self.times.items())
+        return stats
+
+
+class ProfiledProblem:
+    """Stands in for problem in a search, adding the time spent in each of
+    its methods actions, result, goal_test, path_cost and h (those it has) to
+    stats.times under the method's name. Everything else is looked up on
+    problem. What is left of the time of the search is its own bookkeeping:
+    the frontier, the explored set and the nodes."""
+
+    phases = ('actions', 'result', 'goal_test', 'path_cost', 'h')
+
+    def __init__(self, problem, stats):
+        self.problem = problem
+        for phase in self.phases:
+            if hasattr(problem, phase):
+                setattr(self, phase, self.timed(getattr(problem, phase), phase, stats))
+
+    @staticmethod
+    def timed(method, phase, stats):
+        perf_counter = time.perf_counter
+
+        def timed_method(*args):
+            start = perf_counter()
+            try:
+                return method(*args)
+            finally:
+                stats.add_time(phase, perf_counter() - start)
+        return timed_method
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+
+def counted(h, stats):
+    """h, with its calls counted in stats if there is one."""
+    return h if stats is None else stats.counted(h)
+
+
 # ______________________________________________________________________________
 # Uninformed Search algorithms
+# Every search takes an optional SearchStats, which it keeps up to date. The
+# duplicates are counted as the children that did not make it to the frontier.
 
-def breadth_first_graph_search(problem):
+def breadth_first_graph_search(problem, stats=None):
     """[Figure 3.11]
     Note that this function can be implemented in a
     single line as below:
     return graph_search(problem, FIFOQueue())
     """
     node = Node(problem.initial)
+    explored = set()
     if problem.goal_test(node.state):
-        return node
+        return node, explored
 
-    frontier = deque([node])  # FIFO queue
-    explored = set()
+    frontier = KeyedQueue(key=lambda n: n.key)  # FIFO queue
+    frontier.append(node)
     
     while True:
         if len(frontier) == 0:
             return None, None
         
-        node = frontier.popleft()
-        explored.add(tuple(node.state))
+        node = frontier.pop()
+        explored.add(node.key)
+        size = len(frontier)
         
-        for child in node.expand(problem):
-            if tuple(child.state) not in explored and child not in frontier:
+        children = node.expand(problem)
+        for child in children:
+            if child.key not in explored and child not in frontier:
                 if problem.goal_test(child.state):
+                    if stats is not None:
+                        stats.expanded += 1
+                        stats.generated += len(children)
                     return child, explored
                 frontier.append(child)
+        if stats is not None:
+            stats.expanded += 1
+            stats.generated += len(children)
+            stats.duplicates += len(children) - (len(frontier) - size)
+            stats.frontier(len(frontier))
 
 
-def depth_first_graph_search(problem):
+def depth_first_graph_search(problem, stats=None):
     """
     [Figure 3.7]
     Search the deepest nodes in the search tree first.
@@ -171,7 +324,7 @@ def depth_first_graph_search(problem):
     Does not get trapped by loops.
     If two paths reach a state, only use the first one.
     """
-    frontier = []
+    frontier = KeyedQueue(lifo=True, key=lambda n: n.key)  # LIFO stack
     frontier.append(Node(problem.initial))
     explored = set()
     while True:
@@ -180,45 +333,115 @@ def depth_first_graph_search(problem):
         node = frontier.pop()
         if problem.goal_test(node.state):
             return node, explored
-        explored.add(tuple(node.state))
-        frontier.extend(child for child in node.expand(problem) if tuple(child.state) not in explored and child not in frontier)
+        explored.add(node.key)
+        size = len(frontier)
+        children = node.expand(problem)
+        frontier.extend(child for child in children if child.key not in explored and child not in frontier)
+        if stats is not None:
+            stats.expanded += 1
+            stats.generated += len(children)
+            stats.duplicates += len(children) - (len(frontier) - size)
+            stats.frontier(len(frontier))
+
+
+class SearchEvent:
+    """One step of a search run as a generator (see best_first_graph_search_steps).
+    kind is 'expand' when node was taken from the frontier and its children
+    generated, 'goal' when node is a goal and the search is over, or 'fail'
+    when the frontier ran out (node is None). frontier_size is the size of the
+    frontier after the step; explored is the search's own explored set, so it
+    keeps growing as the search goes on."""
+
+    __slots__ = ('kind', 'node', 'children', 'frontier_size', 'explored')
+
+    def __init__(self, kind, node, children, frontier_size, explored):
+        self.kind = kind
+        self.node = node
+        self.children = children
+        self.frontier_size = frontier_size
+        self.explored = explored
+
+    def __repr__(self):
+        return "<SearchEvent {} {}>".format(self.kind, self.node)
+
+
+def run_steps(steps, max_expansions=None, time_limit=None, observer=None):
+    """Run the search generator steps and return (node, explored) like the
+    searches do; steps keeps its own stats. observer, if given, is called with every event. The search
+    is stopped early once it has expanded max_expansions nodes or run for
+    time_limit seconds; it then returns (None, explored), explored holding
+    what was expanded so far, where a search that failed returns (None, None)."""
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    expanded = 0
+    for event in steps:
+        if observer is not None:
+            observer(event)
+        if event.kind == 'goal':
+            return event.node, event.explored
+        if event.kind == 'fail':
+            return None, None
+        expanded += 1
+        if ((max_expansions is not None and expanded >= max_expansions) or
+                (deadline is not None and time.perf_counter() >= deadline)):
+            steps.close()
+            return None, event.explored
+    return None, None
+
+
+def best_first_graph_search_steps(problem, f=None, stats=None):
+    """Search the nodes with the lowest f scores first, as a generator of
+    SearchEvents: one 'expand' event per node expanded, then a 'goal' or a
+    'fail' event. The caller can look at the search as it goes, and stop it
+    by no longer asking for events; see run_steps. With no f, it is the
+    heuristic problem.h, whose calls are counted in stats."""
+    if f is None and stats is not None:
+        f = stats.counted(problem.h)
+    f = cache_f(f or problem.h)
+    node = Node(problem.initial)
+    frontier = IndexedPriorityQueue('min', f, key=lambda n: n.key)
+    frontier.append(node)
+    explored = set()
+    while frontier:
+        node = frontier.pop()
+        if problem.goal_test(node.state):
+            yield SearchEvent('goal', node, (), len(frontier), explored)
+            return
+        explored.add(node.key)
+        size = len(frontier)
+        children = node.expand(problem)
+        for child in children:
+            if child in frontier:
+                if f(child) < frontier[child]:
+                    frontier.update(child)
+            elif child.key not in explored:
+                frontier.append(child)
+        if stats is not None:
+            stats.expanded += 1
+            stats.generated += len(children)
+            stats.duplicates += len(children) - (len(frontier) - size)
+            stats.frontier(len(frontier))
+        yield SearchEvent('expand', node, children, len(frontier), explored)
+    yield SearchEvent('fail', None, (), 0, explored)
 
 
-def best_first_graph_search(problem, f=None):
+def best_first_graph_search(problem, f=None, stats=None):
     """Search the nodes with the lowest f scores first.
     You specify the function f(node) that you want to minimize; for example,
     if f is a heuristic estimate to the goal, then we have greedy best
     first search; if f is node.depth then we have breadth-first search.
-    There is a subtlety: the line "f = memoize(f, 'f')" means that the f
+    There is a subtlety: the line "f = cache_f(f)" means that the f
     values will be cached on the nodes as they are computed. So after doing
     a best first search you can examine the f values of the path returned.
+    The frontier is an IndexedPriorityQueue keyed on the node's state, so the
+    membership test and the decrease-key below are O(1) and O(log n).
+    This runs best_first_graph_search_steps to the end.
     """
-    f = memoize(f or problem.h, 'f')
-    node = Node(problem.initial)
-    frontier = PriorityQueue('min', f)
-    frontier.append(node)
-    explored = set()
-    while True:
-        if len(frontier) == 0:
-            return None, None
-        node = frontier.pop()
-        if problem.goal_test(node.state):
-            print(node)
-            return node, explored
-        explored.add(tuple(node.state))
-        
-        for child in node.expand(problem):
-            if tuple(child.state) not in explored and child not in frontier:
-                frontier.append(child)
-            elif child in frontier:
-                if f(child) < frontier[child]:
-                    del frontier[child]
-                    frontier.append(child)
+    return run_steps(best_first_graph_search_steps(problem, f, stats))
 
 
-def uniform_cost_search(problem):
+def uniform_cost_search(problem, stats=None):
     """[Figure 3.14]"""
-    return best_first_graph_search(problem, lambda node: node.path_cost)
+    return best_first_graph_search(problem, lambda node: node.path_cost, stats)
 
 
 # ______________________________________________________________________________
@@ -231,12 +454,648 @@ greedy_best_first_graph_search = best_first_graph_search
 # Greedy best-first search is accomplished by specifying f(n) = h(n).
 
 
-def astar_search(problem, h=None):
+def astar_search(problem, h=None, stats=None):
     """A* search is best-first graph search with f(n) = g(n)+h(n).
     You need to specify the h function when you call astar_search, or
     else in your Problem subclass."""
-    h = memoize(h or problem.h, 'h')
-    return best_first_graph_search(problem, lambda n: n.path_cost + h(n))
+    return run_steps(astar_search_steps(problem, h, stats))
+
+
+def astar_search_steps(problem, h=None, stats=None):
+    """A* search as a generator of SearchEvents, like
+    best_first_graph_search_steps."""
+    h = cache_h(counted(h or problem.h, stats))
+    return best_first_graph_search_steps(problem, lambda n: n.path_cost + h(n), stats)
+
+
+# ______________________________________________________________________________
+# Bounded-suboptimal search
+# With an admissible h, these find paths that cost at most w times the optimal.
+
+
+def weighted_astar_search(problem, w=1.5, h=None, stats=None):
+    """Weighted A*: best-first graph search with f(n) = g(n) + w * h(n).
+    For w > 1 it expands fewer nodes than A*, and the path it returns costs
+    at most w times the optimal."""
+    h = cache_h(counted(h or problem.h, stats))
+    return best_first_graph_search(problem, lambda n: n.path_cost + w * h(n), stats)
+
+
+def anytime_astar_search(problem, h=None, w=2.5, step=0.5, time_limit=None, report=None, stats=None):
+    """ARA*, anytime repairing A* [Likhachev et al. 2003]: weighted A* from
+    weight w, lowered by step each round and the search repaired, until the
+    path is optimal or time_limit seconds have passed. After each round that
+    improves the path or its bound, report(node, bound) is called, bound
+    being the factor within which the path is known to be optimal."""
+    h = cache_h(counted(h or problem.h, stats))
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    weight = w
+
+    def f(n):
+        return n.path_cost + weight * h(n)
+
+    root = Node(problem.initial)
+    best = {root.key: root}     # the cheapest node found for each state
+    frontier = IndexedPriorityQueue('min', f, key=lambda n: n.key)
+    frontier.append(root)
+    inconsistent = {}           # improved after their expansion this round
+    explored = set()
+    solution = root if problem.goal_test(root.state) else None
+    reported = None
+    while True:
+        closed = set()
+        expansions = 0
+        while frontier and (solution is None or solution.path_cost > frontier.top()[0]):
+            if deadline is not None and expansions % 64 == 0 and time.perf_counter() >= deadline:
+                return solution, explored
+            node = frontier.pop()
+            if problem.goal_test(node.state):
+                if solution is None or node.path_cost < solution.path_cost:
+                    solution = node
+                continue
+            closed.add(node.key)
+            explored.add(node.key)
+            expansions += 1
+            children = node.expand(problem)
+            for child in children:
+                old = best.get(child.key)
+                if old is not None and old.path_cost <= child.path_cost:
+                    if stats is not None:
+                        stats.duplicates += 1
+                    continue
+                best[child.key] = child
+                if problem.goal_test(child.state) and (solution is None or child.path_cost < solution.path_cost):
+                    solution = child
+                if child.key in closed:
+                    inconsistent[child.key] = child
+                else:
+                    frontier.append(child)
+            if stats is not None:
+                stats.expanded += 1
+                stats.generated += len(children)
+                stats.frontier(len(frontier) + len(inconsistent))
+        if solution is None:
+            return None, None
+        waiting = [n for _, n in frontier.heap] + list(inconsistent.values())
+        lower = min((n.path_cost + h(n) for n in waiting), default=np.inf)
+        bound = min(weight, solution.path_cost / lower) if lower > 0 else 1 if solution.path_cost == 0 else weight
+        bound = max(bound, 1)
+        if report is not None and (reported is None or solution is not reported[0] or bound < reported[1]):
+            report(solution, bound)
+            reported = (solution, bound)
+        if bound <= 1 or weight <= 1:
+            return solution, explored
+        if deadline is not None and time.perf_counter() >= deadline:
+            return solution, explored
+        weight = max(1, weight - step)
+        frontier = IndexedPriorityQueue('min', f, key=lambda n: n.key)
+        frontier.extend(waiting)
+        inconsistent = {}
+
+
+# ______________________________________________________________________________
+# Memory-bounded heuristic search
+# Both searches return (node, explored) like the others, but explored only
+# holds what they kept in memory, not every state they have visited.
+
+
+def iterative_deepening_astar_search(problem, h=None, node_budget=None, stats=None):
+    """IDA*: repeated depth-first searches that cut off paths whose
+    f = g + h exceeds a bound, raising the bound each round to the smallest f
+    that was cut off. Only the current path is kept, so memory is linear in
+    the depth of the solution; states already on the path are not revisited.
+    node_budget, if given, caps the total number of nodes expanded, after
+    which the search gives up. explored is the set of states on the path.
+    The frontier it reports to stats is the depth of the path, and the
+    duplicates the children already on it."""
+    h = cache_h(counted(h or problem.h, stats))
+    root = Node(problem.initial)
+    bound = root.path_cost + h(root)
+    expanded = 0
+    while True:
+        next_bound = np.inf
+        on_path = {root.key}
+        stack = [(root, None)]
+        while stack:
+            node, children = stack[-1]
+            if children is None:
+                f = node.path_cost + h(node)
+                if f > bound:
+                    next_bound = min(next_bound, f)
+                    stack.pop()
+                    on_path.discard(node.key)
+                    continue
+                if problem.goal_test(node.state):
+                    return node, on_path
+                if node_budget is not None and expanded >= node_budget:
+                    return None, None
+                expanded += 1
+                children = sorted(node.expand(problem), key=lambda c: c.path_cost + h(c))
+                if stats is not None:
+                    stats.expanded += 1
+                    stats.generated += len(children)
+                    stats.frontier(len(stack))
+                children = iter(children)
+                stack[-1] = (node, children)
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_path.discard(node.key)
+            elif child.key not in on_path:
+                on_path.add(child.key)
+                stack.append((child, None))
+            elif stats is not None:
+                stats.duplicates += 1
+        if next_bound == np.inf:
+            return None, None
+        bound = next_bound
+
+
+class MemoryRecord:
+    """What simplified_memory_bounded_astar_search keeps for a Node in memory:
+    its f value, the records of its parent and of its children in memory, the
+    actions it has not generated a child for yet, and the actions of its
+    forgotten children with their backed-up f values."""
+
+    def __init__(self, node, parent, f):
+        self.node = node
+        self.parent = parent
+        self.f = f
+        self.children = []
+        self.unexplored = None
+        self.forgotten = {}
+
+
+def simplified_memory_bounded_astar_search(problem, h=None, node_budget=1000, stats=None):
+    """SMA* [Russell 1992]: A* that never holds more than node_budget nodes.
+    Successors are generated one at a time. When memory is full, the leaf with
+    the highest f (the shallowest among ties) is forgotten, and its parent
+    remembers that f so the subtree is only regenerated once it looks best
+    again. Once all of a node's successors are known, its f is backed up to
+    the best of theirs. Nodes at depth node_budget - 1 that are not goals get
+    f = infinity, since a longer path would not fit in memory. The answer is
+    optimal if an optimal solution's path fits in memory. A successor is
+    dropped when a copy of its state that is at least as cheap is in memory,
+    which keeps the search from going round in cycles. explored is the set of
+    states held in memory when the search ends. Each successor generated counts
+    as an expansion for stats, the successors dropped as duplicates, and the
+    frontier it reports is the number of nodes in memory."""
+    h = cache_h(counted(h or problem.h, stats))
+    node = Node(problem.initial)
+    root = MemoryRecord(node, None, node.path_cost + h(node))
+    frontier = [root]   # records that still have successors to generate
+    held = {root.node.key: root}    # the cheapest record in memory of each state
+    in_memory = 1
+
+    def backup(record):
+        """Raise the f of record and its ancestors to the best f below them,
+        for records whose successors are all known."""
+        while record is not None and not record.unexplored:
+            best = min([child.f for child in record.children] + list(record.forgotten.values()),
+                       default=np.inf)
+            if best == record.f:
+                return
+            record.f = best
+            record = record.parent
+
+    def explored():
+        keys, stack = set(), [root]
+        while stack:
+            record = stack.pop()
+            keys.add(record.node.key)
+            stack.extend(record.children)
+        return keys
+
+    def priority(record):
+        """The f of the next successor record would generate, deepest first."""
+        f = record.f
+        if record.unexplored is not None and not record.unexplored:
+            f = max(f, min(record.forgotten.values(), default=np.inf))
+        return f, -record.node.depth
+
+    while frontier:
+        best = min(frontier, key=priority)
+        if priority(best)[0] == np.inf:
+            return None, None
+        node = best.node
+        if problem.goal_test(node.state):
+            return node, explored()
+        if best.unexplored is None:
+            best.unexplored = list(problem.actions(node.state))
+            if not best.unexplored:
+                backup(best)    # a dead end; it stays a leaf until pruned
+                continue
+        if best.unexplored:
+            action = best.unexplored.pop(0)
+            f = -np.inf
+        else:
+            action = min(best.forgotten, key=best.forgotten.get)
+            f = best.forgotten.pop(action)
+        child = node.child_node(problem, action)
+        if stats is not None:
+            stats.generated += 1
+        done = not best.unexplored and not best.forgotten
+        other = held.get(child.key)
+        if other is not None and other.node.path_cost <= child.path_cost:
+            # a copy of child that is at least as cheap is in memory already
+            if stats is not None:
+                stats.duplicates += 1
+            if done and best.children:
+                frontier.remove(best)
+            backup(best)
+            continue
+        if done:
+            frontier.remove(best)
+        if not problem.goal_test(child.state) and child.depth >= node_budget - 1:
+            f = np.inf
+        else:
+            f = max(best.f, child.path_cost + h(child), f)
+        record = MemoryRecord(child, best, f)
+        best.children.append(record)
+        held[child.key] = record
+        if in_memory >= node_budget:
+            leaves = [r for r in frontier if not r.children]
+            if leaves:
+                worst = max(leaves, key=priority)
+                frontier.remove(worst)
+                if held.get(worst.node.key) is worst:
+                    del held[worst.node.key]
+                parent = worst.parent
+                parent.children.remove(worst)
+                parent.forgotten[worst.node.action] = worst.f
+                if parent not in frontier:
+                    frontier.append(parent)
+                in_memory -= 1
+        frontier.append(record)
+        in_memory += 1
+        if stats is not None:
+            stats.expanded += 1
+            stats.frontier(in_memory)
+        backup(best)
+    return None, None
+
+
+# ______________________________________________________________________________
+# Portfolio search
+
+
+def run_portfolio_member(index, search, problem, answers):
+    """Run one search of portfolio_search in a worker process, and put
+    (index, answer) on the queue answers, answer being the plan as a list of
+    actions (rather than the node, whose chain of parents can be too deep to
+    pickle) with the explored set and stats, or the exception raised."""
+    try:
+        stats = SearchStats()
+        node, explored = search(problem, stats=stats)
+        answer = (node.solution() if node is not None else None, explored, stats)
+    except Exception as error:
+        answer = error
+    answers.put((index, answer))
+
+
+def portfolio_search(problem, searches=None, acceptable=None, processes=None, stats=None):
+    """Race several searches on problem, each in its own process, and return
+    the (node, explored) of the first acceptable answer; the searches still
+    running are then terminated. searches is a list of (search, optimal)
+    pairs, search being called as search(problem, stats=...), like
+    astar_search or a functools.partial of best_first_graph_search. By
+    default it races uniform cost and A* search, which are optimal, against
+    breadth-first and greedy best-first search, which are not. An answer from
+    an optimal search is always acceptable, one from another search if
+    acceptable(node) is true; if none is, the cheapest answer found is
+    returned. The problem and the searches are pickled to the worker
+    processes, so lambdas will not do, and the node is rebuilt here from its
+    actions with node_from_actions. stats, if given, gets the counts of the
+    search whose answer is returned. At most processes searches run at once;
+    by default all of them start together however many cores there are."""
+    if searches is None:
+        searches = [(uniform_cost_search, True), (astar_search, True),
+                    (breadth_first_graph_search, False), (greedy_best_first_graph_search, False)]
+    answers = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=run_portfolio_member, args=(index, search, problem, answers),
+                                       daemon=True)
+               for index, (search, optimal) in enumerate(searches)]
+    running = processes or len(workers)
+    best = None     # (node, explored, stats) of the cheapest answer not accepted yet
+    error = None
+    try:
+        for worker in workers[:running]:
+            worker.start()
+        for _ in searches:
+            index, answer = answers.get()
+            if running < len(workers):
+                workers[running].start()
+                running += 1
+            if isinstance(answer, BaseException):
+                error = error or answer
+                continue
+            actions, explored, member_stats = answer
+            if actions is None:
+                continue
+            node = node_from_actions(problem, actions)
+            if searches[index][1] or (acceptable is not None and acceptable(node)):
+                best = (node, explored, member_stats)
+                break
+            if best is None or node.path_cost < best[0].path_cost:
+                best = (node, explored, member_stats)
+    finally:
+        # a worker may still be searching, or blocked putting an answer no one reads any more
+        for worker in workers[:running]:
+            worker.terminate()
+        for worker in workers[:running]:
+            worker.join()
+        answers.close()
+        answers.cancel_join_thread()
+    if best is None:
+        if error is not None:
+            raise error
+        return None, None
+    node, explored, member_stats = best
+    if stats is not None:
+        stats.merge(member_stats)
+    return node, explored
+
+
+# ______________________________________________________________________________
+# Multi-goal tours
+# Given the matrix of shortest-path distances between a start (stop 0) and a
+# set of goals (stops 1..n-1), choose the order in which to visit the goals.
+# The tour is open: it does not return to the start.
+
+
+def tour_cost(dist, order):
+    """Cost of starting at stop 0 and visiting the stops in order."""
+    cost, here = 0, 0
+    for stop in order:
+        cost += dist[here][stop]
+        here = stop
+    return cost
+
+
+def shortest_tour_order(dist, exact_limit=12):
+    """Return an order of stops 1..n-1 that is cheap to visit from stop 0.
+    With at most exact_limit goals the order is optimal (held_karp_order);
+    otherwise a nearest-neighbour tour is improved with two_opt and or_opt."""
+    if len(dist) - 1 <= exact_limit:
+        return held_karp_order(dist)
+    return or_opt(dist, two_opt(dist, nearest_neighbor_order(dist)))
+
+
+def held_karp_order(dist):
+    """Optimal open tour by dynamic programming over subsets of goals;
+    O(2^n n^2) time, so only for a handful of goals."""
+    n = len(dist) - 1
+    if n == 0:
+        return []
+    full = (1 << n) - 1
+    # best[mask][j]: cost of the cheapest path from stop 0 through the goals
+    # in mask that ends at goal j (bit j-1); prev[mask][j] the goal before j.
+    best = [[np.inf] * (n + 1) for _ in range(full + 1)]
+    prev = [[0] * (n + 1) for _ in range(full + 1)]
+    for j in range(1, n + 1):
+        best[1 << (j - 1)][j] = dist[0][j]
+    for mask in range(1, full + 1):
+        row = best[mask]
+        for j in range(1, n + 1):
+            c = row[j]
+            if c == np.inf:
+                continue
+            for k in range(1, n + 1):
+                bit = 1 << (k - 1)
+                if mask & bit:
+                    continue
+                if c + dist[j][k] < best[mask | bit][k]:
+                    best[mask | bit][k] = c + dist[j][k]
+                    prev[mask | bit][k] = j
+    last = min(range(1, n + 1), key=lambda j: best[full][j])
+    order, mask = [], full
+    while last:
+        order.append(last)
+        last, mask = prev[mask][last], mask & ~(1 << (last - 1))
+    return list(reversed(order))
+
+
+def nearest_neighbor_order(dist):
+    """Greedy tour: always go to the closest goal not yet visited."""
+    unvisited = set(range(1, len(dist)))
+    order, here = [], 0
+    while unvisited:
+        here = min(unvisited, key=lambda j: (dist[here][j], j))
+        unvisited.remove(here)
+        order.append(here)
+    return order
+
+
+def two_opt(dist, order):
+    """Improve an open tour by reversing segments while that shortens it.
+    Assumes dist is symmetric."""
+    tour = [0] + list(order)
+    n = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = tour[i - 1], tour[i]
+            for j in range(i + 1, n):
+                c = tour[j]
+                e = tour[j + 1] if j + 1 < n else None
+                delta = dist[a][c] - dist[a][b]
+                if e is not None:
+                    delta += dist[b][e] - dist[c][e]
+                if delta < 0:
+                    tour[i:j + 1] = reversed(tour[i:j + 1])
+                    b = tour[i]
+                    improved = True
+    return tour[1:]
+
+
+def or_opt(dist, order, max_segment=3):
+    """Improve an open tour by moving runs of up to max_segment consecutive
+    goals (possibly reversed) to a cheaper place in the tour."""
+    tour = [0] + list(order)
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length <= len(tour):
+                segment = tour[i:i + length]
+                before = tour[i - 1]
+                after = tour[i + length] if i + length < len(tour) else None
+                removed = dist[before][segment[0]]
+                if after is not None:
+                    removed += dist[segment[-1]][after] - dist[before][after]
+                rest = tour[:i] + tour[i + length:]
+                best = None
+                for k in range(len(rest)):
+                    if k == i - 1:
+                        continue
+                    p = rest[k]
+                    q = rest[k + 1] if k + 1 < len(rest) else None
+                    for seg in (segment, segment[::-1]):
+                        added = dist[p][seg[0]]
+                        if q is not None:
+                            added += dist[seg[-1]][q] - dist[p][q]
+                        if added < removed and (best is None or added < best[0]):
+                            best = (added, k, seg)
+                if best is not None:
+                    _, k, seg = best
+                    tour = rest[:k + 1] + list(seg) + rest[k + 1:]
+                    improved = True
+                else:
+                    i += 1
+    return tour[1:]
+
+
+# ______________________________________________________________________________
+# Multi-agent goal allocation
+# Given the shortest-path distances from each of several agents to each goal
+# (start_dist[a][g]) and between the goals (goal_dist[g][h]), share the goals
+# out among the agents, each visiting its own goals in order. np.inf marks a
+# goal an agent cannot reach.
+
+
+def min_cost_assignment(cost):
+    """Hungarian method: match the rows of the n x m matrix cost one to one
+    with its columns, min(n, m) pairs in all, so that the total cost of the
+    pairs is least. Returns, for each row, the column matched with it, or
+    None. Pairs of infinite cost are never returned. O(n^2 m) time."""
+    cost = np.asarray(cost, dtype=float)
+    if cost.size == 0:
+        return [None] * len(cost)
+    if len(cost) > len(cost[0]):
+        rows = min_cost_assignment(cost.T)
+        match = [None] * len(cost)
+        for j, i in enumerate(rows):
+            if i is not None:
+                match[i] = j
+        return match
+    n, m = cost.shape
+    finite = np.isfinite(cost)
+    # an infinite cost is replaced by one no finite matching can reach
+    big = np.abs(cost[finite]).sum() + 1 if finite.any() else 1
+    a = np.where(finite, cost, big)
+    # potentials u of the rows and v of the columns, column 0 standing for no
+    # column; p[j] is the row matched with column j (1-based, 0 for none)
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=int)
+    way = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            cur = a[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            j1 = int(np.argmin(np.where(free, minv[1:], np.inf))) + 1
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    match = [None] * n
+    for j in range(1, m + 1):
+        if p[j] and finite[p[j] - 1, j - 1]:
+            match[p[j] - 1] = j - 1
+    return match
+
+
+def route_cost(start_dist, goal_dist, agent, route):
+    """Cost of agent visiting the goals of route in order."""
+    cost, here = 0, None
+    for goal in route:
+        cost += start_dist[agent][goal] if here is None else goal_dist[here][goal]
+        here = goal
+    return cost
+
+
+def hungarian_allocation(start_dist, goal_dist):
+    """Allocate the goals in rounds: each round, min_cost_assignment gives
+    every agent at most one more goal, an agent's cost for a goal being the
+    cost of its route so far plus the trip from its last goal, so that the
+    rounds keep the routes even."""
+    agents = range(len(start_dist))
+    routes = [[] for _ in agents]
+    finish = [0] * len(routes)
+    left = list(range(len(goal_dist)))
+    while left:
+        cost = [[finish[a] + (goal_dist[routes[a][-1]][g] if routes[a] else start_dist[a][g]) for g in left]
+                for a in agents]
+        match = min_cost_assignment(cost)
+        if all(k is None for k in match):
+            break   # the goals left are out of every agent's reach
+        for a, k in enumerate(match):
+            if k is not None:
+                routes[a].append(left[k])
+                finish[a] = cost[a][k]
+        taken = {left[k] for k in match if k is not None}
+        left = [g for g in left if g not in taken]
+    return routes
+
+
+def auction_allocation(start_dist, goal_dist):
+    """Sequential single-item auction: each round every agent bids for every
+    goal left the cost of its route with the goal put in at the best place,
+    and the lowest bid wins, which keeps the longest route (the time until
+    every goal is visited) short."""
+    routes = [[] for _ in start_dist]
+    costs = [0] * len(routes)
+    left = set(range(len(goal_dist)))
+
+    def trip(a, here, goal):
+        return start_dist[a][goal] if here is None else goal_dist[here][goal]
+
+    while left:
+        best = None
+        for g in left:
+            for a, route in enumerate(routes):
+                stops = [None] + route
+                for k in range(len(route) + 1):
+                    added = trip(a, stops[k], g)
+                    if k < len(route):
+                        added += goal_dist[g][route[k]] - trip(a, stops[k], route[k])
+                    bid = costs[a] + added
+                    if best is None or bid < best[0]:
+                        best = (bid, g, a, k)
+        bid, g, a, k = best
+        if bid == np.inf:
+            break   # the goals left are out of every agent's reach
+        routes[a].insert(k, g)
+        costs[a] = bid
+        left.discard(g)
+    return routes
+
+
+def allocate_goals(start_dist, goal_dist, method='hungarian'):
+    """Share the goals out among the agents with hungarian_allocation or
+    auction_allocation, then order each agent's goals with
+    shortest_tour_order where that makes its route shorter. Returns the
+    list of goals of each agent, in the order to visit them; a goal no
+    agent can reach is left out."""
+    allocate = {'hungarian': hungarian_allocation, 'auction': auction_allocation}[method]
+    routes = allocate(start_dist, goal_dist)
+    for a, route in enumerate(routes):
+        if len(route) < 3:
+            continue
+        dist = [[0] + [start_dist[a][g] for g in route]] + \
+               [[0] + [goal_dist[g][h] for h in route] for g in route]
+        order = [route[k - 1] for k in shortest_tour_order(dist)]
+        if route_cost(start_dist, goal_dist, a, order) < route_cost(start_dist, goal_dist, a, route):
+            routes[a] = order
+    return routes
 
 
 # ______________________________________________________________________________
@@ -262,6 +1121,10 @@ class PeakFindingProblem(Problem):
         assert self.n > 0
         self.m = len(grid[0])
         assert self.m > 0
+        # the grid as a NumPy array (a view, if it is one already) and the moves of the actions, for
+        # neighbor_values
+        self.array = np.asarray(grid)
+        self.moves = np.array(list(defined_actions.values()))
 
     def actions(self, state):
         """Returns the list of actions which are allowed to be taken from the given state"""
@@ -284,6 +1147,138 @@ class PeakFindingProblem(Problem):
         assert 0 <= y < self.m
         return self.grid[x][y]
 
+    def neighbor_values(self, states):
+        """actions, result and value for many states at once: for a k x 2
+        array of states, return the k x a x 2 array of the states the a
+        defined actions lead to, and the k x a array of their values, which
+        is -infinity for the actions that would leave the grid."""
+        nexts = states[:, None, :] + self.moves
+        inside = ((nexts >= 0) & (nexts < (self.n, self.m))).all(axis=2)
+        values = np.full(inside.shape, -np.inf)
+        xs, ys = nexts[inside].T
+        values[inside] = self.array[xs, ys]
+        return nexts, values
+
+
+# ______________________________________________________________________________
+# Local search
+# These climb problem.value on a PeakFindingProblem, looking at all the
+# neighbours of a state, or of many states, with one neighbor_values call.
+
+
+def grid_values(problem, states):
+    """The values of a k x 2 array of states, as floats."""
+    return problem.array[states[:, 0], states[:, 1]].astype(float)
+
+
+def random_states(problem, k, rng):
+    """A k x 2 array of states picked at random on the grid of problem."""
+    return np.column_stack((rng.integers(problem.n, size=k), rng.integers(problem.m, size=k)))
+
+
+def climb(problem, states):
+    """Steepest-ascent hill climbing from each of the k x 2 array of states,
+    all at the same time. Returns the states they ended on, where no
+    neighbour is higher, and their values."""
+    states = np.array(states)
+    values = grid_values(problem, states)
+    climbing = np.arange(len(states))
+    while climbing.size:
+        nexts, next_values = problem.neighbor_values(states[climbing])
+        rows = np.arange(len(climbing))
+        best = next_values.argmax(axis=1)
+        higher = next_values[rows, best] > values[climbing]
+        states[climbing[higher]] = nexts[rows, best][higher]
+        values[climbing[higher]] = next_values[rows, best][higher]
+        climbing = climbing[higher]
+    return states, values
+
+
+def highest_peak(problem, starts):
+    """The (state, value) of the highest peak climb reaches from starts."""
+    states, values = climb(problem, starts)
+    best = values.argmax()
+    return tuple(states[best].tolist()), values[best]
+
+
+def hill_climbing(problem, restarts=0, processes=1, seed=None):
+    """[Figure 4.2]
+    From the initial state, keep moving to the highest neighbour until no
+    neighbour is higher than the current state, and return that state. With
+    restarts, it also climbs from that many random states, and returns the
+    highest peak found. The climbs are split among processes worker
+    processes (all the cores if it is None); the problem is pickled to each,
+    which for a large grid only pays off with many restarts."""
+    rng = np.random.default_rng(seed)
+    starts = np.vstack(([problem.initial], random_states(problem, restarts, rng)))
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1 or len(starts) == 1:
+        return highest_peak(problem, starts)[0]
+    with multiprocessing.Pool(processes) as pool:
+        peaks = pool.starmap(highest_peak, [(problem, part) for part in np.array_split(starts, processes)
+                                            if len(part)])
+    return max(peaks, key=lambda peak: peak[1])[0]
+
+
+def exp_schedule(k=20, lam=0.005, limit=100):
+    """One possible schedule function for simulated annealing: the
+    temperature decays exponentially from k, and is 0 from time limit on."""
+    return lambda t: (k * np.exp(-lam * t) if t < limit else 0)
+
+
+def linear_schedule(k=20, limit=100):
+    """A schedule whose temperature falls from k to 0 in limit steps."""
+    return lambda t: (k * (1 - t / limit) if t < limit else 0)
+
+
+def simulated_annealing(problem, schedule=exp_schedule(), chains=1, seed=None):
+    """[Figure 4.5]
+    Move to a random neighbour if it is higher, or else with probability
+    exp(delta / T), the temperature T = schedule(t) falling with the time t,
+    and return the current state once T is 0. schedule can be any function
+    of t, such as exp_schedule or linear_schedule. chains runs that many
+    walks from the initial state side by side, each with its own random
+    moves, and returns the highest state they end on."""
+    rng = np.random.default_rng(seed)
+    states = np.array([problem.initial] * chains)
+    values = grid_values(problem, states)
+    rows = np.arange(chains)
+    t = 0
+    while True:
+        T = schedule(t)
+        if T == 0:
+            break
+        nexts, next_values = problem.neighbor_values(states)
+        # a random action among those that stay on the grid
+        pick = np.where(np.isfinite(next_values), rng.random(next_values.shape), -1).argmax(axis=1)
+        delta = next_values[rows, pick] - values
+        move = (delta > 0) | (rng.random(chains) < np.exp(np.minimum(delta, 0) / T))
+        states[move] = nexts[rows, pick][move]
+        values[move] = next_values[rows, pick][move]
+        t += 1
+    return tuple(states[values.argmax()].tolist())
+
+
+def local_beam_search(problem, k=10, seed=None):
+    """Keep k states, the initial one and k - 1 random ones. At each step,
+    replace them with the k highest distinct states among all their
+    neighbours, until none of those is higher than the highest state kept,
+    which is returned."""
+    rng = np.random.default_rng(seed)
+    states = np.vstack(([problem.initial], random_states(problem, k - 1, rng)))
+    values = grid_values(problem, states)
+    while True:
+        nexts, next_values = problem.neighbor_values(states)
+        inside = np.isfinite(next_values)
+        nexts, next_values = nexts[inside], next_values[inside]
+        _, first = np.unique(nexts[:, 0] * problem.m + nexts[:, 1], return_index=True)
+        nexts, next_values = nexts[first], next_values[first]
+        if not len(next_values) or next_values.max() <= values.max():
+            break
+        best = np.argsort(next_values)[::-1][:k]
+        states, values = nexts[best], next_values[best]
+    return tuple(states[values.argmax()].tolist())
+
 # _____________________________________________________________________________
 # The remainder of this file implements examples for the search algorithms.
 
@@ -340,9 +1335,9 @@ class Graph:
 
     def nodes(self):
         """Return a list of nodes in the graph."""
-        s1 = set([k for k in self.graph_dict.keys()])
-        s2 = set([k2 for v in self.graph_dict.values() for k2, v2 in v.items()])
-        nodes = s1.union(s2)
+        nodes = set(self.graph_dict)
+        for links in self.graph_dict.values():
+            nodes.update(links)
         return list(nodes)
 
 
@@ -383,11 +1378,15 @@ def RandomGraph(nodes=list(range(10)), min_links=2, width=400, height=300,
 
 
 class GraphProblem(Problem):
-    """The problem of searching a graph from one node to another."""
+    """The problem of searching a graph from one node to another. distances,
+    if given, is an AllPairsDistances or a LandmarkDistances of the graph,
+    which h then uses instead of the straight-line distance; it can be shared
+    by all the problems on the same graph."""
 
-    def __init__(self, initial, goal, graph):
+    def __init__(self, initial, goal, graph, distances=None):
         super().__init__(initial, goal)
         self.graph = graph
+        self.distances = distances
 
     def actions(self, A):
         """The actions at a graph node are just its neighbors."""
@@ -398,7 +1397,8 @@ class GraphProblem(Problem):
         return action
 
     def path_cost(self, cost_so_far, A, action, B):
-        return cost_so_far + (self.graph.get(A, B) or np.inf)
+        length = self.graph.get(A, B)
+        return cost_so_far + (length if length is not None else np.inf)
 
     def find_min_edge(self):
         """Find minimum value of edges."""
@@ -410,7 +1410,10 @@ class GraphProblem(Problem):
         return m
 
     def h(self, node):
-        """h function is straight-line distance from a node's state to goal."""
+        """h function is straight-line distance from a node's state to goal,
+        or the estimate of self.distances if there is one."""
+        if self.distances is not None:
+            return self.distances.estimate(node if type(node) is str else node.state, self.goal)
         locs = getattr(self.graph, 'locations', None)
         if locs:
             if type(node) is str:
@@ -428,13 +1431,412 @@ class GraphProblemStochastic(GraphProblem):
 
     Define the graph as dict(A = dict(Action = [[<Result 1>, <Result 2>, ...], <cost>], ...), ...)
     A the dictionary format is different, make sure the graph is created as a directed graph.
+    The cost can be left out, as in dict(A = dict(Action = [<Result 1>, <Result 2>, ...])); it is then 1.
     """
 
+    def outcome(self, state, action):
+        """The (results, cost) of action in state."""
+        outcome = self.graph.get(state, action)
+        if len(outcome) == 2 and isinstance(outcome[0], list):
+            return outcome
+        return outcome, 1
+
     def result(self, state, action):
-        return self.graph.get(state, action)
+        """The list of the states action may lead to."""
+        return self.outcome(state, action)[0]
 
-    def path_cost(self):
-        raise NotImplementedError
+    def path_cost(self, c, state1, action, state2):
+        return c + self.outcome(state1, action)[1]
+
+
+# ______________________________________________________________________________
+# AND-OR search
+
+
+# the memos of and_or_graph_search for GraphProblemStochastic, by graph and then
+# by goal; after changing a graph, drop its memos with and_or_memos.pop(graph, None)
+and_or_memos = weakref.WeakKeyDictionary()
+
+
+def and_or_graph_search(problem, memo=None):
+    """[Figure 4.11]
+    Used when the environment is nondeterministic and completely observable:
+    problem.result(state, action) is the list of the states action may lead
+    to. Returns a contingency plan, [] in a goal state and otherwise
+    [action, {state: plan}] with a plan for each state action may lead to;
+    None if no plan is sure to reach a goal. A state that is already on the
+    path is a dead end, so the plans have no loops.
+    memo maps the states solved so far to their plans (or to None if they
+    have none), and is filled in as the search goes, so that searches that
+    share it reuse each other's subplans; it must only be shared between
+    problems with the same actions, results and goal. A dead end that came
+    from a loop back to a state higher up the path is not kept, since from
+    elsewhere the state may have a plan.
+    By default the problems on the same graph and goal share a memo (see
+    and_or_memos) if they are GraphProblemStochastic problems; other problems
+    get a memo of their own."""
+    if memo is None:
+        memo = and_or_memo(problem)
+    path = {}   # the depth of each state on the path
+
+    def or_search(state):
+        """Return (plan, low): low is the least depth of the states on the
+        path the search ran into and had to avoid, infinity if none."""
+        if state in memo:
+            return memo[state], np.inf
+        if problem.goal_test(state):
+            memo[state] = []
+            return [], np.inf
+        if state in path:
+            return None, path[state]
+        depth = path[state] = len(path)
+        low = np.inf
+        for action in problem.actions(state):
+            plan, plan_low = and_search(problem.result(state, action))
+            if plan is not None:
+                del path[state]
+                memo[state] = [action, plan]
+                return memo[state], np.inf
+            low = min(low, plan_low)
+        del path[state]
+        if low >= depth:
+            memo[state] = None
+            return None, np.inf
+        return None, low
+
+    def and_search(states):
+        plan = {}
+        for s in states:
+            plan[s], low = or_search(s)
+            if plan[s] is None:
+                return None, low
+        return plan, np.inf
+
+    return or_search(problem.initial)[0]
+
+
+def and_or_memo(problem):
+    """The memo and_or_graph_search uses for problem by default."""
+    if not isinstance(problem, GraphProblemStochastic):
+        return {}
+    return and_or_memos.setdefault(problem.graph, {}).setdefault(state_key(problem.goal), {})
+
+
+# ______________________________________________________________________________
+# Precomputed distances on graphs
+# For many queries on the same graph, work done once up front makes each
+# astar_search quick: pass the result to GraphProblem as distances. The graph
+# must not change afterwards, and its links must have numeric lengths.
+
+
+def graph_index(graph):
+    """Return the list of the nodes of graph, and a dict from node to its
+    position in that list."""
+    nodes = graph.nodes()
+    return nodes, {node: i for i, node in enumerate(nodes)}
+
+
+def dijkstra_distances(graph, source, index, reverse=False):
+    """Array of the shortest distances from source to every node of graph,
+    in the order of index (see graph_index); infinity for the nodes it cannot
+    reach. With reverse true the links are followed backwards, which gives
+    the distances to source instead. reverse can also be a dict of the
+    backward links, {B: {A: distance}}, so that it is only built once."""
+    links = graph.graph_dict
+    if reverse is True:
+        reverse = reverse_links(graph)
+    if reverse:
+        links = reverse
+    dist = np.full(len(index), np.inf)
+    dist[index[source]] = 0
+    heap = [(0, index[source], source)]
+    while heap:
+        d, i, node = heapq.heappop(heap)
+        if d > dist[i]:
+            continue
+        for other, length in links.get(node, {}).items():
+            j = index[other]
+            if d + length < dist[j]:
+                dist[j] = d + length
+                heapq.heappush(heap, (d + length, j, other))
+    return dist
+
+
+def reverse_links(graph):
+    """The links of graph backwards, as {B: {A: distance}}."""
+    reverse = {}
+    for a, links in graph.graph_dict.items():
+        for b, length in links.items():
+            reverse.setdefault(b, {})[a] = length
+    return reverse
+
+
+class AllPairsDistances:
+    """The shortest distance between every two nodes of a graph, by the
+    Floyd-Warshall algorithm on a NumPy matrix: O(n^3) time, but one array
+    operation per node, and O(n^2) memory, so for graphs of up to a few
+    thousand nodes. It also keeps the first hop of each shortest path, so
+    path(a, b) does not need a search at all. With estimate as the heuristic
+    (GraphProblem does that when given distances), A* only expands the nodes
+    on the shortest paths."""
+
+    def __init__(self, graph):
+        self.nodes, self.index = graph_index(graph)
+        n = len(self.nodes)
+        dist = np.full((n, n), np.inf)
+        hop = np.full((n, n), -1)
+        for a, links in graph.graph_dict.items():
+            i = self.index[a]
+            for b, length in links.items():
+                j = self.index[b]
+                if length < dist[i, j]:
+                    dist[i, j] = length
+                    hop[i, j] = j
+        np.fill_diagonal(dist, 0)
+        np.fill_diagonal(hop, np.arange(n))
+        for k in range(n):
+            through = dist[:, k, None] + dist[k]
+            shorter = through < dist
+            np.copyto(dist, through, where=shorter)
+            np.copyto(hop, hop[:, k, None], where=shorter)
+        self.dist = dist
+        self.hop = hop
+
+    def distance(self, a, b):
+        """The length of the shortest path from a to b; infinity if there is none."""
+        return self.dist[self.index[a], self.index[b]]
+
+    estimate = distance
+
+    def path(self, a, b):
+        """The nodes of the shortest path from a to b, a and b included; None
+        if there is none."""
+        i, j = self.index[a], self.index[b]
+        if self.hop[i, j] < 0:
+            return None
+        path = [a]
+        while i != j:
+            i = self.hop[i, j]
+            path.append(self.nodes[i])
+        return path
+
+
+class LandmarkDistances:
+    """ALT lower bounds [Goldberg and Harrelson 2005] for graphs too big for
+    AllPairsDistances. The shortest distances from and to a few landmark
+    nodes are computed with Dijkstra's algorithm, and by the triangle
+    inequality d(a, b) >= d(L, b) - d(L, a) and d(a, b) >= d(a, L) - d(b, L)
+    for each landmark L; estimate takes the largest of these bounds, an
+    admissible and consistent heuristic. The landmarks are picked one after
+    the other, each the node farthest from those already picked, starting
+    from the one farthest from the first node of the graph. Memory is
+    O(n * landmarks)."""
+
+    def __init__(self, graph, landmarks=16):
+        self.nodes, self.index = graph_index(graph)
+        reverse = reverse_links(graph) if graph.directed else None
+        n = len(self.nodes)
+        landmarks = min(landmarks, n)
+        self.landmarks = []
+        self.dist_from = np.empty((n, landmarks))     # [a, l]: from landmark l to a
+        self.dist_to = np.empty((n, landmarks))       # [a, l]: from a to landmark l
+        nearest = dijkstra_distances(graph, self.nodes[0], self.index) if n else None
+        for l in range(landmarks):
+            reached = nearest.copy()     # the nodes no landmark reaches come first
+            reached[[self.index[m] for m in self.landmarks]] = -1
+            landmark = self.nodes[int(np.argmax(reached))]
+            self.landmarks.append(landmark)
+            self.dist_from[:, l] = dijkstra_distances(graph, landmark, self.index)
+            self.dist_to[:, l] = (dijkstra_distances(graph, landmark, self.index, reverse)
+                                  if reverse is not None else self.dist_from[:, l])
+            nearest = self.dist_from[:, l] if l == 0 else np.minimum(nearest, self.dist_from[:, l])
+
+    def estimate(self, a, b):
+        """A lower bound on the length of the shortest path from a to b."""
+        i, j = self.index[a], self.index[b]
+        with np.errstate(invalid='ignore'):
+            forward = np.fmax.reduce(self.dist_from[j] - self.dist_from[i], initial=0)
+            backward = np.fmax.reduce(self.dist_to[i] - self.dist_to[j], initial=0)
+        return max(forward, backward)
+
+
+def graph_distances(graph, all_pairs_limit=2000, landmarks=16):
+    """Precompute the distances of graph for GraphProblem: an
+    AllPairsDistances if it has at most all_pairs_limit nodes, a
+    LandmarkDistances otherwise."""
+    if len(graph.nodes()) <= all_pairs_limit:
+        return AllPairsDistances(graph)
+    return LandmarkDistances(graph, landmarks)
+
+
+# ______________________________________________________________________________
+# Compact graphs
+# For graphs with millions of links, a dict of dicts takes too much memory and
+# is too slow to build. A CompactGraph keeps the links in NumPy arrays instead.
+
+
+class CompactGraph:
+    """A graph whose nodes are the integers 0..n-1, stored in compressed
+    sparse row form: the links out of node a are targets[offsets[a]:offsets[a + 1]],
+    sorted, and weights holds their lengths. An undirected graph stores each
+    link both ways. locations, if given, is an n x 2 array of coordinates,
+    and names a list of the original names of the nodes (see from_graph).
+    get and nodes work like Graph's, but a search should use
+    CompactGraphProblem rather than GraphProblem, which is much slower."""
+
+    def __init__(self, offsets, targets, weights, directed=True, locations=None, names=None):
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.directed = directed
+        self.locations = locations
+        self.names = names
+
+    @classmethod
+    def from_edges(cls, n, sources, targets, weights, directed=True, locations=None, names=None):
+        """Build the graph with n nodes and a link of length weights[i] from
+        sources[i] to targets[i] for each i (and back, if it is undirected)."""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights)
+        if not directed:
+            sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+            weights = np.concatenate((weights, weights))
+        order = np.lexsort((targets, sources))
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        return cls(offsets, targets[order], weights[order], directed, locations, names)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Convert the Graph graph. Its nodes are numbered in the order of
+        graph.nodes(), kept as names; its locations, if it has any, follow."""
+        names, index = graph_index(graph)
+        sources, targets, weights = [], [], []
+        for a, links in graph.graph_dict.items():
+            for b, length in links.items():
+                sources.append(index[a])
+                targets.append(index[b])
+                weights.append(length)
+        locs = getattr(graph, 'locations', None)
+        locations = np.array([locs[name] for name in names]) if locs else None
+        return cls.from_edges(len(names), sources, targets, weights, True, locations, names)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def links(self, a):
+        """The positions in targets and weights of the links out of a."""
+        return range(self.offsets[a], self.offsets[a + 1])
+
+    def get(self, a, b=None):
+        """Like Graph.get: the dict of links out of a, or the length of the
+        link from a to b (None if there is none)."""
+        start, end = self.offsets[a], self.offsets[a + 1]
+        if b is None:
+            return dict(zip(self.targets[start:end].tolist(), self.weights[start:end].tolist()))
+        i = start + np.searchsorted(self.targets[start:end], b)
+        if i < end and self.targets[i] == b:
+            return self.weights[i].item()
+        return None
+
+    def nodes(self):
+        return range(len(self))
+
+
+def random_compact_graph(n=10, min_links=2, width=400, height=300, curvature=(1.1, 1.5), seed=None):
+    """A random undirected CompactGraph like RandomGraph's, built with NumPy
+    so that it scales to millions of links: n nodes placed at random on a
+    (width x height) rectangle, each linked to its min_links nearest
+    neighbours, with the straight-line distance times a random curvature
+    between curvature[0] and curvature[1] as the length (rounded down). The
+    nodes are first binned into square cells of about 2 * min_links nodes
+    each, and each node's neighbours looked for in the 3 x 3 cells around it;
+    the few nodes that do not find min_links neighbours near enough there to
+    be sure (the cell size) are compared to all nodes instead."""
+    rng = np.random.default_rng(seed)
+    locations = np.column_stack((rng.integers(width, size=n), rng.integers(height, size=n)))
+    k = min(min_links, n - 1)
+    if k <= 0:
+        return CompactGraph.from_edges(n, [], [], [], False, locations)
+    size = max(np.sqrt(width * height * 2 * k / n), 1)
+    columns = int(width // size) + 1
+    rows = int(height // size) + 1
+    cell = (locations[:, 1] // size).astype(np.int64) * columns + (locations[:, 0] // size).astype(np.int64)
+    # the nodes are numbered cell by cell, so the nodes of a cell are next to each other in memory
+    order = np.argsort(cell, kind='stable')
+    locations, cell = locations[order], cell[order]
+    px, py = locations[:, 0].astype(float), locations[:, 1].astype(float)
+    cx, cy = cell % columns, cell // columns
+    starts = np.searchsorted(cell, np.arange(rows * columns + 1))
+    # three cells side by side hold consecutive nodes, so the nodes in the 3 x 3 cells around node i
+    # are lows[r, i]:highs[r, i] for r = 0, 1, 2 (the row above i's cell, its own row, the row below)
+    lows, highs = [], []
+    for dy in (-1, 0, 1):
+        y = cy + dy
+        inside = (y >= 0) & (y < rows)
+        row = np.clip(y, 0, rows - 1) * columns
+        lows.append(starts[row + np.maximum(cx - 1, 0)])
+        highs.append(np.where(inside, starts[row + np.minimum(cx + 1, columns - 1) + 1], lows[-1]))
+    lows, highs = np.array(lows), np.array(highs)
+    most = int(np.max(highs - lows))
+    neighbors = np.empty((n, k), dtype=np.int64)
+    far = []
+    chunk = max(1, 2 ** 20 // (3 * most))
+    for first in range(0, n, chunk):
+        nodes = np.arange(first, min(first + chunk, n))
+        slots = lows[:, nodes, None] + np.arange(most)
+        valid = slots < highs[:, nodes, None]
+        candidates = np.minimum(slots, n - 1).transpose(1, 0, 2).reshape(len(nodes), -1)
+        valid = valid.transpose(1, 0, 2).reshape(len(nodes), -1) & (candidates != nodes[:, None])
+        dist = (px[candidates] - px[nodes, None]) ** 2 + (py[candidates] - py[nodes, None]) ** 2
+        dist[~valid] = np.inf
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        neighbors[nodes] = np.take_along_axis(candidates, nearest, axis=1)
+        far.extend(nodes[np.take_along_axis(dist, nearest, axis=1).max(axis=1) > size * size])
+    for node in far:
+        dist = (px - px[node]) ** 2 + (py - py[node]) ** 2
+        dist[node] = np.inf
+        neighbors[node] = np.argpartition(dist, k - 1)[:k]
+    sources = np.repeat(np.arange(n), k)
+    targets = neighbors.ravel()
+    # one link per pair of nodes, however many of the two chose the other
+    pairs = np.unique(np.minimum(sources, targets) * n + np.maximum(sources, targets))
+    sources, targets = pairs // n, pairs % n
+    lengths = np.hypot(px[sources] - px[targets], py[sources] - py[targets]) * \
+        rng.uniform(*curvature, size=len(pairs))
+    return CompactGraph.from_edges(n, sources, targets, lengths.astype(np.int64), False, locations)
+
+
+class CompactGraphProblem(GraphProblem):
+    """The problem of searching a CompactGraph from one node to another. An
+    action is the position of a link in graph.targets, so that following it
+    is an array lookup; the states a solution goes through are
+    graph.targets[solution]."""
+
+    def actions(self, A):
+        return self.graph.links(A)
+
+    def result(self, state, action):
+        return self.graph.targets[action].item()
+
+    def path_cost(self, cost_so_far, A, action, B):
+        return cost_so_far + self.graph.weights[action].item()
+
+    def find_min_edge(self):
+        """Find minimum value of edges."""
+        return self.graph.weights.min() if len(self.graph.weights) else np.inf
+
+    def h(self, node):
+        """Straight-line distance from a node's state to goal, or the
+        estimate of self.distances if there is one."""
+        state = node if isinstance(node, int) else node.state
+        if self.distances is not None:
+            return self.distances.estimate(state, self.goal)
+        locs = self.graph.locations
+        if locs is None:
+            return np.inf
+        return int(distance(locs[state].tolist(), locs[self.goal].tolist()))
 
 
 # ______________________________________________________________________________
@@ -0,0 +1,34 @@
+from search import *
+
+
+def small_graph():
+    return UndirectedGraph(dict(A=dict(B=1, C=4), B=dict(C=2)))
+
+
+def test_anytime_astar_start_is_goal():
+    problem = GraphProblem('A', 'A', small_graph())
+    node, explored = anytime_astar_search(problem, lambda n: 0)
+    assert node is not None and node.state == 'A' and node.path_cost == 0
+
+
+def test_anytime_astar_matches_uniform_cost():
+    problem = GraphProblem('A', 'C', small_graph())
+    node, explored = anytime_astar_search(problem, lambda n: 0)
+    assert node.path_cost == uniform_cost_search(problem)[0].path_cost == 3
+
+
+class CountDown(Problem):
+    """A problem with no h: from initial, subtract 1 or 2 until 0."""
+
+    def actions(self, state):
+        return [k for k in (1, 2) if k <= state]
+
+    def result(self, state, action):
+        return state - action
+
+
+def test_profiled_problem_without_h():
+    stats = SearchStats(profile=True)
+    node, explored = breadth_first_graph_search(ProfiledProblem(CountDown(5, 0), stats), stats)
+    assert node.path_cost == 3
+    assert 'h' not in stats.times and stats.times['actions'] > 0
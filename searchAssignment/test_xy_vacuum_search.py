@@ -0,0 +1,175 @@
+import contextlib
+import io
+import random
+import threading
+
+import numpy as np
+import pytest
+
+from agents import Dirt, Wall
+from xy_vacuum_search import DirtDistanceField, HeadlessVacuumEnvironment, VacuumPlanning
+
+
+def plan(env, engine):
+    problem = VacuumPlanning(env, engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        problem.generateSolution()
+    return problem
+
+
+def test_portfolio_repeated():
+    """The portfolio stops the searches still running after each answer; run it many times, so that a
+    search left hanging on the way fails the test instead of going unnoticed."""
+    results = []
+
+    def run():
+        for seed in range(30):
+            env = HeadlessVacuumEnvironment.from_seed(20, 18, seed)
+            plan(env, 'Portfolio')
+            results.append(env.path)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(120)
+    assert not worker.is_alive(), "portfolio search hung after {} runs".format(len(results))
+    for seed, path in enumerate(results):
+        env = HeadlessVacuumEnvironment.from_seed(20, 18, seed)
+        plan(env, 'UCS')
+        assert (path is None) == (env.path is None)
+        if path is not None:
+            assert path.path_cost == env.path.path_cost
+
+
+walledOffDirt = """
+#######
+#A..#*#
+#...###
+#######
+"""
+
+
+@pytest.mark.parametrize('engine', ['BFS', 'A*', 'Bidirectional', 'JPS', 'D* Lite', 'Wavefront'])
+def test_unreachable_dirt(engine):
+    env = HeadlessVacuumEnvironment.from_text(walledOffDirt)
+    plan(env, engine)
+    assert env.path is None and env.explored is None
+
+
+def test_failed_plan_drops_the_last(capsys):
+    env = HeadlessVacuumEnvironment.from_text(walledOffDirt.replace('#*#', '.*#'))
+    problem = VacuumPlanning(env, 'BFS')
+    problem.generateSolution()
+    assert env.path is not None and env.explored is not None
+    env.add_thing(Wall(), (4, 2))
+    problem.generateSolution()
+    assert env.path is None and env.explored is None
+    assert capsys.readouterr().out == ''
+
+
+def test_arastar_agent_on_dirt():
+    env = HeadlessVacuumEnvironment.from_seed(12, 10, 0)
+    env.add_thing(Dirt(), env.agent.location)
+    plan(env, 'ARA*')
+    assert env.path is not None and env.path.path_cost == 0
+
+
+@pytest.mark.parametrize('engine', ['Tour', 'D* Lite', 'BFS'])
+def test_agent_on_wall(engine):
+    """A wall put where the agent stands: no room can reach the agent, but the plan still leaves from it."""
+    env = HeadlessVacuumEnvironment.from_text("""
+#########
+#*..A..*#
+#...#...#
+#########
+""")
+    env.add_thing(Wall(), env.agent.location)
+    plan(env, engine)
+    assert env.path is not None and env.path.path_cost == 3
+
+
+def test_plan_cache_keys_arastar_settings():
+    env = HeadlessVacuumEnvironment.from_seed(20, 18, 1)
+    problem = plan(env, 'ARA*')
+    problem.anytimeWeight = 1
+    with contextlib.redirect_stdout(io.StringIO()):
+        problem.generateSolution()
+    assert len(problem.planCache) == 2
+
+
+@pytest.mark.parametrize('engine', ['A*', 'D* Lite'])
+def test_load_grids_seen_by_planner(engine):
+    env = HeadlessVacuumEnvironment.from_text("""
+#######
+#A...*#
+#.....#
+#######
+""")
+    problem = plan(env, engine)
+    assert env.path.state[:2] == (5, 2)
+    dirt = bytearray(len(env.dirt_grid))
+    dirt[env.cell_index((2, 1))] = 1
+    env.load_grids(env.wall_grid, dirt)
+    with contextlib.redirect_stdout(io.StringIO()):
+        problem.generateSolution()
+    assert env.path.state[:2] == (2, 1)
+
+
+@pytest.mark.parametrize('name', ['map.txt', 'map.npy'])
+def test_map_round_trip_agents_on_dirt_and_walls(tmp_path, name):
+    env = HeadlessVacuumEnvironment.from_text("""
+######
+#A.*.#
+#..+.#
+######
+""")
+    env.place_agent((4, 1))
+    env.add_thing(Wall(), (4, 1))
+    assert len(env.agents) == 3 and env.dirt_grid[env.cell_index((3, 1))]
+    path = str(tmp_path / name)
+    env.save(path)
+    loaded = HeadlessVacuumEnvironment.load(path)
+    assert loaded.to_text() == env.to_text() == "######\n#A.*.#\n#..+@#\n######\n"
+    assert sorted(agent.location for agent in loaded.agents) == [(1, 2), (3, 1), (4, 1)]
+    assert loaded.dirt_grid == env.dirt_grid and loaded.wall_grid == env.wall_grid
+
+
+@pytest.mark.parametrize('turnAware', [False, True])
+def test_dirt_field_updates_match_rebuild(turnAware):
+    """Clean and dirty rooms a few at a time: the table sync repairs must equal one built from scratch."""
+    rnd = random.Random(0)
+    width, height = 23, 17
+    field = DirtDistanceField(width, height, turnAware)
+    dirt = bytearray(width * height)
+    for step in range(40):
+        for _ in range(rnd.choice([1, 2, 3, 30])):
+            dirt[rnd.randrange(len(dirt))] = rnd.random() < 0.5
+        field.sync(dirt)
+        fresh = DirtDistanceField(width, height, turnAware)
+        fresh.rooms = set(i for i, d in enumerate(dirt) if d)
+        expected = np.full(field.field.shape, np.inf)
+        for room in fresh.rooms:
+            expected = np.minimum(expected, fresh.room_costs(room, np.arange(len(dirt))))
+        assert np.array_equal(field.field, expected), step
+
+
+def test_distance_fields_in_batches():
+    """Fields searched a few grids at a time are the plain breadth-first distances, as when all go at once."""
+    env = HeadlessVacuumEnvironment.from_seed(15, 12, 2)
+    problem = VacuumPlanning(env, 'Tour')
+    sources = [i for i, wall in enumerate(env.wall_grid) if not wall][:9]
+    together = [field.copy() for field in problem.distance_fields(sources)]
+    problem.fieldCache.clear()
+    problem.batchCells = 4 * len(env.wall_grid)
+    for source, field, same in zip(sources, problem.distance_fields(sources), together):
+        expected = [-1] * len(env.wall_grid)
+        expected[source], layer, d = 0, [source], 0
+        while layer:
+            d += 1
+            next_layer = []
+            for i in layer:
+                for j in (i + step for step in problem.steps):
+                    if not env.wall_grid[j] and expected[j] < 0:
+                        expected[j] = d
+                        next_layer.append(j)
+            layer = next_layer
+        assert field.tolist() == expected and same.tolist() == expected
@@ -425,6 +425,37 @@ def memoize(fn, slot=None, maxsize=32):
     return memoized_fn
 
 
+class LRUCache:
+    """A cache of at most maxsize key/value pairs that forgets the least
+    recently used one when full. Unlike memoize, the caller picks the key."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the value for key, or default if it is not cached."""
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
 def name(obj):
     """Try to find some reasonable name for the object."""
     return (getattr(obj, 'name', 0) or getattr(obj, '__name__', 0) or
@@ -716,7 +747,43 @@ class hashabledict(dict):
 # ______________________________________________________________________________
 # Queues: Stack, FIFOQueue, PriorityQueue
 # Stack and FIFOQueue are implemented as list and collection.deque
-# PriorityQueue is implemented here
+# KeyedQueue, PriorityQueue and IndexedPriorityQueue are implemented here
+
+
+class KeyedQueue:
+    """A FIFOQueue (or, if lifo is True, a Stack) that also keeps the set of
+    key(item) for the items it holds, so membership tests are O(1) instead of
+    a scan of the whole queue. Callers are expected not to queue two items
+    with the same key (check membership first, as graph search does)."""
+
+    def __init__(self, lifo=False, key=lambda x: x):
+        self.items = collections.deque()
+        self.keys = set()
+        self.lifo = lifo
+        self.key = key
+
+    def append(self, item):
+        """Add item to the back of the queue (or the top of the stack)."""
+        self.items.append(item)
+        self.keys.add(self.key(item))
+
+    def extend(self, items):
+        """Add each item in items."""
+        for item in items:
+            self.append(item)
+
+    def pop(self):
+        """Remove and return the oldest item (the newest one if lifo)."""
+        item = self.items.pop() if self.lifo else self.items.popleft()
+        self.keys.discard(self.key(item))
+        return item
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        """Return True if an item with the same key is queued."""
+        return self.key(item) in self.keys
 
 
 class PriorityQueue:
@@ -777,6 +844,119 @@ class PriorityQueue:
         heapq.heapify(self.heap)
 
 
+class IndexedPriorityQueue(PriorityQueue):
+    """A PriorityQueue that also maps key(item) to the item's position in the
+    heap. Membership and lookup are O(1); deletion and decrease-key are
+    O(log n) instead of a linear scan followed by a full heapify.
+    Items with the same key are treated as the same entry, so the queue never
+    holds two of them. key defaults to the item itself and must be hashable."""
+
+    def __init__(self, order='min', f=lambda x: x, key=lambda x: x):
+        super().__init__(order, f)
+        self.key = key
+        self.index = {}
+
+    def append(self, item):
+        """Insert item at its correct position. If an item with the same key
+        is already queued, it is replaced (see update)."""
+        k = self.key(item)
+        if k in self.index:
+            self.update(item)
+            return
+        self.heap.append((self.f(item), item))
+        self.index[k] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def update(self, item):
+        """Replace the queued item that has the same key as item with item
+        itself, and move it to the position given by its new f value."""
+        i = self.index[self.key(item)]
+        old_value = self.heap[i][0]
+        self.heap[i] = (self.f(item), item)
+        if self.heap[i][0] < old_value:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def pop(self):
+        """Pop and return the item (with min or max f(x) value)
+        depending on the order."""
+        if not self.heap:
+            raise Exception('Trying to pop from empty PriorityQueue.')
+        return self._remove_at(0)
+
+    def top(self):
+        """Return the (f value, item) pair pop would remove next, without
+        removing it."""
+        if not self.heap:
+            raise Exception('Trying to look at the top of an empty PriorityQueue.')
+        return self.heap[0]
+
+    def __contains__(self, item):
+        """Return True if an item with the same key is in the queue."""
+        return self.key(item) in self.index
+
+    def __getitem__(self, item):
+        """Return the value associated with the key of item.
+        Raises KeyError if it is not present."""
+        try:
+            return self.heap[self.index[self.key(item)]][0]
+        except KeyError:
+            raise KeyError(str(item) + " is not in the priority queue")
+
+    def __delitem__(self, item):
+        """Delete the entry with the same key as item."""
+        try:
+            i = self.index[self.key(item)]
+        except KeyError:
+            raise KeyError(str(item) + " is not in the priority queue")
+        self._remove_at(i)
+
+    def _remove_at(self, i):
+        """Remove the entry at heap position i and return its item."""
+        heap = self.heap
+        item = heap[i][1]
+        del self.index[self.key(item)]
+        last = heap.pop()
+        if i < len(heap):
+            heap[i] = last
+            self.index[self.key(last[1])] = i
+            self._sift_down(i)
+            self._sift_up(i)
+        return item
+
+    def _sift_up(self, i):
+        heap, index, key = self.heap, self.index, self.key
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[i] = heap[parent]
+            index[key(heap[i][1])] = i
+            i = parent
+        heap[i] = entry
+        index[key(entry[1])] = i
+
+    def _sift_down(self, i):
+        heap, index, key = self.heap, self.index, self.key
+        n = len(heap)
+        entry = heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[i] = heap[child]
+            index[key(heap[i][1])] = i
+            i = child
+        heap[i] = entry
+        index[key(entry[1])] = i
+
+
 # ______________________________________________________________________________
 # Useful Shorthands
 
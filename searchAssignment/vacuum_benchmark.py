@@ -0,0 +1,209 @@
+"""Batch benchmark of the vacuum planners, without the GUI.
+
+Runs every engine in searchTypes (or the ones asked for) on a corpus of maps and reports, for each run,
+the counters of SearchStats (nodes expanded and generated, duplicates, peak frontier size and calls to
+the heuristic), the wall-clock time and the cost and length of the path found, as CSV or JSON. The
+corpus is either random maps built like the GUI's test environment, one per grid size and seed, or map
+files, text or .npy (see HeadlessVacuumEnvironment). --save-maps keeps the random maps as .npy files, so
+that later runs can use the very same ones:
+
+    python vacuum_benchmark.py --sizes 10x10 20x18 40x40 --seeds 5 --save-maps maps/
+    python vacuum_benchmark.py --maps maps/*.npy --engines A* JPS
+    python vacuum_benchmark.py --maps room1.txt room2.txt --turn-cost --format json --out results.json
+    python vacuum_benchmark.py --sizes 40x40 --engines A* IDA* --profile
+
+With --profile, each row also has the seconds spent in each phase of planning (see profileFields):
+reading the map, updating the heuristic, searching, and within the search the problem's methods.
+
+With --agents, fleets of each of the given sizes clean every map with FleetPlanning instead, the agents
+but the map's own put in random free rooms (the same ones for every assignment method), and each row
+reports the steps until the fleet is done (see fleetFields):
+
+    python vacuum_benchmark.py --sizes 40x40 --dirt 30 --agents 1 2 4 8
+
+What counts as an expansion and as the frontier depends on the engine; see SearchStats and the engines'
+docstrings; the engines of xy_vacuum_search that work on the grid directly only count expansions and the
+frontier. Only the planning is timed, not building the map.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from search import ProfiledProblem, SearchStats
+from xy_vacuum_search import FleetPlanning, HeadlessVacuumEnvironment, VacuumPlanning, searchTypes
+
+fields = ['map', 'width', 'height', 'seed', 'engine', 'turn_cost', 'solved', 'cost', 'steps'] + \
+    list(SearchStats.counters) + ['seconds']
+# the extra columns of --profile; a phase an engine does not go through is left empty
+profileFields = ['time_read_env', 'time_sync', 'time_search'] + \
+    ['time_' + phase for phase in ProfiledProblem.phases]
+# the columns of --agents: dirty rooms at first and cleaned, steps until the fleet is done, moves and waits
+# of all the agents, collisions seen (none, if the routes are right) and plans made
+fleetFields = ['map', 'width', 'height', 'seed', 'agents', 'assignment', 'dirt', 'cleaned', 'steps', 'moves',
+               'waits', 'collisions', 'plans'] + list(SearchStats.counters) + ['seconds']
+
+
+def random_corpus(sizes, seeds, dirtCount=5):
+    """ Yield (name, seed, cells) for seeds random maps of each (width, height) in sizes, cells being the
+    map as an array of cells (see HeadlessVacuumEnvironment.from_cells). The cells let every engine start
+    from its own copy of the same map."""
+    for width, height in sizes:
+        for seed in range(seeds):
+            env = HeadlessVacuumEnvironment.from_seed(width, height, seed, dirtCount)
+            yield '{}x{}'.format(width, height), seed, env.to_cells()
+
+
+def file_corpus(paths):
+    """ Yield (name, None, cells) for each map file in paths."""
+    for path in paths:
+        yield path, None, HeadlessVacuumEnvironment.load(path).to_cells()
+
+
+def save_corpus(corpus, directory):
+    """ Pass on the maps of corpus, saving each one in directory as <name>-<seed>.npy on the way."""
+    os.makedirs(directory, exist_ok=True)
+    for name, seed, cells in corpus:
+        HeadlessVacuumEnvironment.from_cells(cells).save(os.path.join(directory, '{}-{}.npy'.format(name, seed)))
+        yield name, seed, cells
+
+
+def run_engine(cells, engine, turnCostOn=False, profile=False):
+    """ Plan once with engine on a fresh environment built from cells, and return the measurements as
+    a dict with the keys in fields (but for map and seed), and the times of profileFields if profile is
+    true. Whatever the planner prints is dropped."""
+    env = HeadlessVacuumEnvironment.from_cells(cells, turnCostOn)
+    problem = VacuumPlanning(env, engine)
+    problem.stats = SearchStats(profile)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        problem.generateSolution()
+        seconds = time.perf_counter() - start
+    path = env.path
+    row = {'width': env.width, 'height': env.height, 'engine': engine, 'turn_cost': turnCostOn,
+           'solved': path is not None,
+           'cost': path.path_cost if path is not None else None,
+           'steps': len(path.solution()) if path is not None else None,
+           'seconds': seconds}
+    row.update(problem.stats.as_dict())
+    return row
+
+
+def run_fleet(cells, agentCount, assignment, seed=None):
+    """ Clean the map of cells with agentCount agents planned by FleetPlanning: plan, carry the routes out,
+    and plan again while that cleans something. Returns the measurements as a dict with the keys in
+    fleetFields (but for map and seed); only the planning is timed. """
+    env = HeadlessVacuumEnvironment.from_cells(cells)
+    env.scatter_agents(agentCount, seed)
+    fleet = FleetPlanning(env, assignment=assignment)
+    fleet.stats = SearchStats()
+    row = {'width': env.width, 'height': env.height, 'agents': len(env.agents), 'assignment': assignment,
+           'dirt': sum(env.dirt_grid), 'steps': 0, 'moves': 0, 'waits': 0, 'collisions': 0, 'plans': 0,
+           'seconds': 0}
+    left = row['dirt']
+    with contextlib.redirect_stdout(io.StringIO()):
+        while left:
+            start = time.perf_counter()
+            fleet.generateSolution()
+            row['seconds'] += time.perf_counter() - start
+            row['plans'] += 1
+            for route in env.routes.values():
+                row['waits'] += route.count('NoOp')
+                row['moves'] += len(route) - route.count('NoOp') - route.count('Suck')
+            steps, collisions = env.run_routes()
+            row['steps'] += steps
+            row['collisions'] += collisions
+            if sum(env.dirt_grid) == left:
+                break
+            left = sum(env.dirt_grid)
+    row['cleaned'] = row['dirt'] - sum(env.dirt_grid)
+    row.update(fleet.stats.as_dict())
+    return row
+
+
+def run_fleet_benchmark(corpus, fleetSizes, assignments):
+    """ Clean every map of corpus with fleets of each size and assignment method, and return the list of
+    result rows."""
+    rows = []
+    for name, seed, cells in corpus:
+        for agentCount in fleetSizes:
+            for assignment in assignments:
+                row = {'map': name, 'seed': seed}
+                row.update(run_fleet(cells, agentCount, assignment, seed))
+                rows.append(row)
+    return rows
+
+
+def run_benchmark(corpus, engines, turnCostOn=False, profile=False):
+    """ Run every engine on every map of corpus, and return the list of result rows."""
+    rows = []
+    for name, seed, cells in corpus:
+        for engine in engines:
+            row = {'map': name, 'seed': seed}
+            row.update(run_engine(cells, engine, turnCostOn, profile))
+            rows.append(row)
+    return rows
+
+
+def write_results(rows, out, format='csv', profile=False, columns=fields):
+    """ Write rows to the file object out as CSV or JSON, with the columns of profileFields if profile
+    is true."""
+    if format == 'json':
+        json.dump(rows, out, indent=2)
+        out.write('\n')
+    else:
+        writer = csv.DictWriter(out, fieldnames=columns + profileFields if profile else columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(10, 10), (20, 18), (40, 40)],
+                        metavar='WxH', help='grid sizes of the random maps')
+    parser.add_argument('--seeds', type=int, default=5, help='random maps per grid size')
+    parser.add_argument('--dirt', type=int, default=5, help='dirty rooms per random map')
+    parser.add_argument('--maps', nargs='+', metavar='FILE', help='map files (text or .npy) to use instead of '
+                                                                  'random ones')
+    parser.add_argument('--save-maps', metavar='DIR', help='save the random maps in DIR as .npy files')
+    parser.add_argument('--engines', nargs='+', choices=searchTypes[1:], default=searchTypes[1:])
+    parser.add_argument('--turn-cost', action='store_true', help='plan with turn cost on')
+    parser.add_argument('--profile', action='store_true', help='also report the time spent in each phase')
+    parser.add_argument('--agents', nargs='+', type=int, metavar='N',
+                        help='clean each map with fleets of these sizes instead of running the engines')
+    parser.add_argument('--assignment', nargs='+', choices=FleetPlanning.assignments,
+                        default=FleetPlanning.assignments, help='how a fleet shares out the dirty rooms')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--out', help='file to write the results to (default: standard output)')
+    args = parser.parse_args(argv)
+
+    if args.maps:
+        corpus = file_corpus(args.maps)
+    else:
+        corpus = random_corpus(args.sizes, args.seeds, args.dirt)
+        if args.save_maps:
+            corpus = save_corpus(corpus, args.save_maps)
+    if args.agents:
+        rows = run_fleet_benchmark(corpus, args.agents, args.assignment)
+        columns, profile = fleetFields, False
+    else:
+        rows = run_benchmark(corpus, args.engines, args.turn_cost, args.profile)
+        columns, profile = fields, args.profile
+    if args.out:
+        with open(args.out, 'w', newline='') as out:
+            write_results(rows, out, args.format, profile, columns)
+    else:
+        write_results(rows, sys.stdout, args.format, profile, columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,10 @@ from agents import *
 from search import *
 import sys
 import math
+import time
 import copy
-from utils import PriorityQueue
+import heapq
+from utils import PriorityQueue, IndexedPriorityQueue, LRUCache
 
 """
 1- BFS: Breadth first search. Using tree or graph version, whichever makes more sense for the problem
@@ -13,16 +15,61 @@ from utils import PriorityQueue
 3- UCS: Uniform-Cost-Search. Using the following cost function to optimise the path, from initial to current state.
 4- Greedy: Uses Manhattan distance to the next closest dirty room as heuristic for greedy algorithm. To find the next closest dirty room, use Manhattan distance.
 5- A*:  Using A star search.
+6- Tour: Plans the route through all the dirty rooms at once: breadth-first distances between the agent and every
+   dirty room, then the visiting order (exact for a few rooms, 2-opt/Or-opt otherwise). Ignores turn cost.
+7- Bidirectional: Breadth-first search from the agent and, at the same time, backwards from all the dirty rooms,
+   until the two meet in the middle.
+8- JPS: Jump Point Search, A* that jumps along straight runs of rooms and only stops at rooms where the path may
+   have to turn.
+Bidirectional and JPS rely on every move costing the same, so with TurnCost on they fall back to A*.
+9- IDA*: Iterative deepening A*, depth-first searches under a growing f bound; memory is only the current path.
+10- SMA*: Simplified memory-bounded A*, A* that forgets its worst leaves once it holds nodeBudget nodes.
+IDA* and SMA* give up (no solution) once they have expanded more than nodeBudget nodes, resp. when even the
+path to the goal does not fit in nodeBudget nodes.
+11- Portfolio: Runs BFS, UCS, A* and Greedy at once, each in its own process, and takes the first answer known to
+    be optimal: UCS's or A*'s, BFS's without turn cost, or any whose cost matches the heuristic of the start.
+12- D* Lite: Incremental search that keeps its distances between plans and, after walls or dirt are edited or
+    the agent has moved, only repairs the part of them the change affects. Like Bidirectional and JPS, it
+    falls back to A* with TurnCost on.
+13- Wavefront: Breadth-first search done with NumPy, a whole layer of rooms at a time, then back from the dirty
+    room it reached down the distances to the agent. Falls back to A* with TurnCost on, too.
+14- ARA*: Anytime repairing A*. Weighted A* finds a path quickly, which is then improved, with a lower weight
+    each round, until it is optimal or anytimeLimit seconds have passed. Prints the cost of every better
+    path and how far from optimal it can be.
+With more than one agent (the Agents menu), the engine is not used: FleetPlanning shares the dirty rooms out
+among the agents and plans their routes together with space-time A*, so that they never collide.
 """
-searchTypes = ['None', 'BFS', 'DFS', 'UCS', 'Greedy', 'A*']
+searchTypes = ['None', 'BFS', 'DFS', 'UCS', 'Greedy', 'A*', 'Tour', 'Bidirectional', 'JPS', 'IDA*', 'SMA*',
+               'Portfolio', 'D* Lite', 'Wavefront', 'ARA*']
+# numbers of agents the GUI offers; more than one cleans with FleetPlanning
+fleetSizes = [1, 2, 3, 4, 6, 8]
+
+# (dx, dy) of each move, in the order VacuumPlanning.actions lists them
+actionDeltas = {'UP': (0, 1), 'DOWN': (0, -1), 'LEFT': (-1, 0), 'RIGHT': (1, 0)}
+# cost of changing heading from the first direction to the second: 0.5 for each 90' turn. None stands for
+# no heading yet, which costs nothing to leave.
+turnCosts = {(a, b): 0 if a == b else 1 if (da[0] == -db[0] and da[1] == -db[1]) else 0.5
+             for a, da in actionDeltas.items() for b, db in actionDeltas.items()}
+turnCosts.update({(None, b): 0 for b in actionDeltas})
+# position of each heading in the per-cell layers of DirtDistanceField
+headingIndex = {a: k for k, a in enumerate(actionDeltas)}
 
 
 class VacuumPlanning(Problem):
     """ The problem of find the next room to clean in a grid of m x n rooms.
     A state is represented by state of the grid cells locations. Each room is specified by index set
     (i, j), i in range(m) and j in range (n). Final goal is to clean all dirty rooms. We go by performing sub-goals, each being cleaning the "next" dirty room.
+    When turn cost is on, the state also carries the agent's heading, (i, j, heading), so that reaching a room
+    facing different ways are different states for the graph searches.
     """
 
+    # node budget of the memory-bounded engines: nodes expanded by IDA*, nodes held in memory by SMA*
+    nodeBudget = 20000
+    # first weight of ARA*, how much it is lowered each round, and the seconds ARA* may take
+    anytimeWeight = 2.5
+    anytimeStep = 0.5
+    anytimeLimit = 0.5
+
     def __init__(self, env, searchtype):
         """ Define goal state and initialize a problem
             initial is a pair (i, j) of where the agent is
@@ -30,133 +77,911 @@ class VacuumPlanning(Problem):
         """
         self.solution = None
         self.env = env
-        self.state = env.agent.location
-        super().__init__(self.state)
         self.map = env.things
         self.searchType = searchtype
         env.agent.direction = 'UP'  #initial direction of the agent.
         self.agent = env.agent
         self.turnCostOn = env.turnCostOn
-
-
+        self.state = self.start_state()
+        super().__init__(self.state)
+        # occupancy grids of the environment; add_thing/delete_thing keep them
+        # in sync, so actions and goal_test are array lookups.
+        self.width = env.width
+        self.walls = env.wall_grid
+        self.dirt = env.dirt_grid
+        # index offset of each move in actionDeltas within the grids
+        self.steps = [dy * self.width + dx for dx, dy in actionDeltas.values()]
+        # h(node) table, brought up to date with the dirt grid by generateSolution
+        self.dirtField = DirtDistanceField(env.width, env.height, self.turnCostOn)
+        self.dirtField.sync(self.dirt)
+        # a SearchStats for generateSolution to pass to the engine, if set
+        self.stats = None
+        # versions of the walls and dirt the plans are made for, updated by generateSolution
+        self.mapVersion = (env.wall_version, env.dirt_version)
+        # plans by (engine, turn cost, node budget, ARA* settings, start state, wall version, dirt version), and
+        # distance_fields results from a cell to every room by (cell, wall version); the versions change with
+        # every map edit. tour_search makes room in fieldCache for all its stops.
+        self.planCache = LRUCache(64)
+        self.fieldCache = LRUCache(64)
+        # the D* Lite engine's planner, kept from one plan to the next
+        self.dstar = None
+        # called with each SearchEvent of the UCS, Greedy and A* engines, if set (the GUI uses it to show the
+        # search as it goes)
+        self.observer = None
+
+
+    def start_state(self):
+        """ The state the agent is in: its location, plus its heading when turn cost is on."""
+        x, y = self.env.agent.location
+        if self.turnCostOn:
+            return x, y, self.env.agent.direction
+        return x, y
 
     def generateSolution(self):
-        """ generate full path to the next goal based on type of the search chosen by user"""
+        """ generate full path to the next goal based on type of the search chosen by user. If self.stats is
+        set with profile on, the time spent reading the map, bringing the heuristic up to date and searching
+        is added to its times as 'read_env', 'sync' and 'search'. """
+        profile = self.stats is not None and self.stats.profile
+        start = time.perf_counter() if profile else None
         self.env.read_env()
-        self.state = env.agent.location
+        if profile:
+            now = time.perf_counter()
+            self.stats.add_time('read_env', now - start)
+            start = now
+        self.dirtField.sync(self.dirt)
+        if profile:
+            now = time.perf_counter()
+            self.stats.add_time('sync', now - start)
+            start = now
+        self.state = self.start_state()
         super().__init__(self.state)
+        # an unchanged map, start and engine give the same plan, so it is only searched for once
+        self.mapVersion = (self.env.wall_version, self.env.dirt_version)
+        key = (self.searchType, self.turnCostOn, self.nodeBudget, self.anytimeWeight, self.anytimeStep,
+               self.anytimeLimit, self.state) + self.mapVersion
+        if key in self.planCache:
+            path, explored = self.planCache.get(key)
+        else:
+            path, explored = self.plan()
+            self.planCache.put(key, (path, explored))
+        if profile:
+            self.stats.add_time('search', time.perf_counter() - start)
+
+        # a None goes to the environment too, so that it drops the last plan instead of keeping it
+        self.env.set_solution(path)
+        self.env.display_explored(explored)
+
+    def plan(self):
+        """ Run the search engine chosen by the user from the current state, and return its (node, explored).
+        With profiling on, the searches of search.py are run on a ProfiledProblem, which times the calls to
+        actions, result, goal_test, path_cost and h. """
         path = None
         explored = None
+        stats = self.stats
+        problem = ProfiledProblem(self, stats) if stats is not None and stats.profile else self
         if self.searchType == 'BFS':
-            path, explored = breadth_first_graph_search(self)
+            path, explored = breadth_first_graph_search(problem, stats)
         elif self.searchType == 'DFS':
-            path, explored = depth_first_graph_search(self)
+            path, explored = depth_first_graph_search(problem, stats)
         elif self.searchType == 'UCS':
-            path, explored = best_first_graph_search(self, lambda node: node.path_cost)
+            path, explored = run_steps(best_first_graph_search_steps(problem, lambda node: node.path_cost, stats),
+                                       observer=self.observer)
         elif self.searchType == 'Greedy':
-            path, explored = best_first_graph_search(self, None)
+            path, explored = run_steps(best_first_graph_search_steps(problem, None, stats), observer=self.observer)
         elif self.searchType == 'A*':
-            path, explored = astar_search(self, None)
+            path, explored = run_steps(astar_search_steps(problem, None, stats), observer=self.observer)
+        elif self.searchType == 'Tour':
+            path, explored = self.tour_search(stats)
+        elif self.searchType in ('Bidirectional', 'JPS', 'D* Lite', 'Wavefront') and self.turnCostOn:
+            print("{} assumes uniform move cost; using A* since TurnCost is on".format(self.searchType))
+            path, explored = astar_search(problem, None, stats)
+        elif self.searchType == 'Bidirectional':
+            path, explored = self.bidirectional_search(stats)
+        elif self.searchType == 'JPS':
+            path, explored = self.jump_point_search(stats)
+        elif self.searchType == 'D* Lite':
+            path, explored = self.incremental_search(stats)
+        elif self.searchType == 'Wavefront':
+            path, explored = self.wavefront_search(stats)
+        elif self.searchType == 'ARA*':
+            path, explored = anytime_astar_search(problem, None, self.anytimeWeight, self.anytimeStep,
+                                                     self.anytimeLimit, self.report_bound, stats)
+        elif self.searchType == 'IDA*':
+            path, explored = iterative_deepening_astar_search(problem, None, self.nodeBudget, stats)
+        elif self.searchType == 'SMA*':
+            path, explored = simplified_memory_bounded_astar_search(problem, None, self.nodeBudget, stats)
+        elif self.searchType == 'Portfolio':
+            bound = self.h(Node(self.initial))
+            path, explored = portfolio_search(self, self.portfolio(), lambda node: node.path_cost <= bound,
+                                              None, stats)
         else:
             raise 'NameError'
-        
-        if ( path != None):
-            self.env.set_solution(path)
-        else:
-            print("There is no solution!\n")
-        if (explored != None):
-            self.env.display_explored(explored)
-        else:
-            print("There is not explored list!\n")
+        return path, explored
 
 
     def generateNextSolution(self):
         self.generateSolution()
 
+    def report_bound(self, node, bound):
+        """ Print a path ARA* found, and the factor within which it is optimal."""
+        print("ARA*: path of cost {} to {}, at most {:.2f} times the optimal".format(node.path_cost, node.state, bound))
+
+    def portfolio(self):
+        """ The (search, optimal) pairs the Portfolio engine races. Breadth-first search is only optimal when
+        every move costs the same. """
+        return [(uniform_cost_search, True), (astar_search, True),
+                (breadth_first_graph_search, not self.turnCostOn), (greedy_best_first_graph_search, False)]
+
+    def __getstate__(self):
+        """ Everything but the environment, which holds the Tk widgets, so that portfolio_search can send the
+        problem to its worker processes. """
+        state = self.__dict__.copy()
+        for name in ('env', 'map', 'agent', 'stats', 'dstar', 'observer', 'planCache', 'fieldCache'):
+            state[name] = None
+        return state
+
+    # cells distance_fields searches at once: more sources than fit are searched in batches
+    batchCells = 1 << 22
+
+    def distance_fields(self, sources, stats=None):
+        """ Breadth-first distance from each cell index of sources to every cell, as arrays with -1 where it is
+        not reached, kept in fieldCache until the walls change. The searches missing from the cache go together
+        with NumPy, as one search over copies of the grid laid end to end, a whole layer of rooms at a time."""
+        key = self.mapVersion[0]
+        fields = {source: self.fieldCache.get((source, key)) for source in sources}
+        missing = [source for source, field in fields.items() if field is None]
+        size = len(self.walls)
+        steps = np.array(self.steps)
+        batch = max(1, self.batchCells // size)
+        for b in range(0, len(missing), batch):
+            chunk = missing[b:b + batch]
+            rooms = np.tile(np.frombuffer(self.walls, dtype=np.uint8) == 0, len(chunk))
+            dist = np.full(len(chunk) * size, -1, dtype=np.int32)
+            slot = np.empty(len(chunk) * size, dtype=np.intp)
+            layer = np.arange(len(chunk)) * size + chunk
+            dist[layer] = 0
+            d = 0
+            while layer.size:
+                d += 1
+                cells = (layer[:, None] + steps).ravel()
+                cells = cells[rooms[cells] & (dist[cells] < 0)]
+                # keep one of each cell reached from more than one side: the last one written to its slot
+                order = np.arange(cells.size)
+                slot[cells] = order
+                cells = cells[slot[cells] == order]
+                dist[cells] = d
+                if stats is not None:
+                    stats.expanded += layer.size
+                    stats.frontier(cells.size)
+                layer = cells
+            for k, source in enumerate(chunk):
+                fields[source] = dist[k * size:(k + 1) * size]
+                self.fieldCache.put((source, key), fields[source])
+        return [fields[source] for source in sources]
+
+    def distance_field(self, source, stats=None):
+        """ distance_fields for the one cell index source."""
+        return self.distance_fields([source], stats)[0]
+
+    def tour_search(self, stats=None):
+        """Plan one route through every reachable dirty room, in the order shortest_tour_order gives for their
+        breadth-first distances. The route has a 'Suck' at each room but the last. Ignores turn cost."""
+        w = self.width
+        start = self.initial[1] * w + self.initial[0]
+        dirty = [i for i, d in enumerate(self.dirt) if d and i != start]
+        if not dirty:
+            return None, None
+        stops = [start] + dirty
+        self.fieldCache.maxsize = max(self.fieldCache.maxsize, len(stops))
+        fields = self.distance_fields(stops, stats)
+        reachable = [k for k in range(1, len(stops)) if fields[0][stops[k]] >= 0]
+        if not reachable:
+            return None, None
+        # only the rooms the nearest one can reach: with the agent on a wall, the rooms on either side of it
+        # may not reach each other (nor the agent, hence the inf for the start, which an open tour never uses)
+        nearest = min(reachable, key=lambda k: fields[0][stops[k]])
+        reachable = [k for k in reachable if fields[nearest][stops[k]] >= 0]
+        stops = [start] + [stops[k] for k in reachable]
+        fields = [fields[0]] + [fields[k] for k in reachable]
+        dist = np.array([field[stops] for field in fields], dtype=float)
+        dist[dist < 0] = np.inf
+        order = shortest_tour_order(dist.tolist())
+
+        node = Node(self.initial)
+        here = 0
+        for n, stop in enumerate(order):
+            # down the distances from the agent's last stop, back from the next one to it
+            field, i = fields[here], stops[stop]
+            cells = [i]
+            while field[i] > 0:
+                i = next(i + step for step in self.steps if field[i + step] == field[i] - 1)
+                cells.append(i)
+            for action in self.cell_path_actions(cells[::-1]):
+                node = node.child_node(self, action)
+            if n < len(order) - 1:
+                node = Node(node.state, node, 'Suck', node.path_cost)
+            here = stop
+
+        reached = np.zeros(len(self.walls), dtype=bool)
+        for field in fields:
+            reached |= field >= 0
+        explored = {(i % w, i // w) for i in np.flatnonzero(reached).tolist() if not self.dirt[i]}
+        return node, explored
+
+
+    def cell_path_actions(self, cells):
+        """ The actions that walk the list of cell indices cells, each cell in a straight line from the last."""
+        w = self.width
+        actions = []
+        for a, b in zip(cells, cells[1:]):
+            if (b - a) % w == 0:
+                actions += ['UP' if b > a else 'DOWN'] * (abs(b - a) // w)
+            else:
+                actions += ['RIGHT' if b > a else 'LEFT'] * abs(b - a)
+        return actions
+
+    def bidirectional_search(self, stats=None):
+        """ Breadth-first search from the agent and back from all the dirty rooms, growing the smaller side a
+        layer at a time until the two meet. """
+        w = self.width
+        walls, steps = self.walls, self.steps
+        start = self.initial[1] * w + self.initial[0]
+        if self.dirt[start]:
+            return Node(self.initial), set()
+        # for each side, the cell it was reached from and the distance it was reached at
+        forward = {start: (None, 0)}
+        backward = {i: (None, 0) for i, d in enumerate(self.dirt) if d}
+        forward_layer, backward_layer = [start], list(backward)
+        meeting = None
+        while forward_layer and backward_layer and meeting is None:
+            if len(forward_layer) <= len(backward_layer):
+                seen, other, layer, sign = forward, backward, forward_layer, 1
+            else:
+                seen, other, layer, sign = backward, forward, backward_layer, -1
+            next_layer, best = [], None
+            for i in layer:
+                d = seen[i][1] + 1
+                for step in steps:
+                    j = i + sign * step
+                    if walls[j] or j in seen:
+                        continue
+                    seen[j] = (i, d)
+                    next_layer.append(j)
+                    if j in other and (best is None or d + other[j][1] < best[0]):
+                        best = (d + other[j][1], j)
+            if best is not None:
+                meeting = best[1]
+            if sign == 1:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+            if stats is not None:
+                stats.expanded += len(layer)
+                stats.frontier(len(forward_layer) + len(backward_layer))
+        if meeting is None:
+            return None, None
+        explored = {(i % w, i // w) for i in set(forward) | set(backward) if not self.dirt[i]}
+        cells, i = [], meeting
+        while i is not None:
+            cells.append(i)
+            i = forward[i][0]
+        cells.reverse()
+        i = backward[meeting][0]
+        while i is not None:
+            cells.append(i)
+            i = backward[i][0]
+        return node_from_actions(self, self.cell_path_actions(cells)), explored
+
+    def jump(self, i, step):
+        """ Move from cell index i by step to the next jump point, or None on hitting a wall. Jump points are
+        dirty rooms and rooms where a path around a wall may turn. """
+        w = self.width
+        walls, dirt = self.walls, self.dirt
+        vertical = abs(step) == w
+        while True:
+            i += step
+            if walls[i]:
+                return None
+            if dirt[i]:
+                return i
+            if vertical:
+                if self.jump(i, 1) is not None or self.jump(i, -1) is not None:
+                    return i
+            elif (walls[i - step + w] and not walls[i + w]) or (walls[i - step - w] and not walls[i - w]):
+                return i
+
+    def jump_directions(self, i, step):
+        """ The directions to jump in from jump point i reached by moving step (None at the start): straight on,
+        plus both sideways after a vertical move, or towards an opening past a wall after a sideways move. """
+        w = self.width
+        walls = self.walls
+        if step is None:
+            return self.steps
+        if abs(step) == w:
+            return [step, 1, -1]
+        return [step] + [side for side in (w, -w) if walls[i - step + side] and not walls[i + side]]
+
+    def jump_point_search(self, stats=None):
+        """ Jump Point Search [Harabor and Grastien 2011] for four-way moves: A* over the jump points, explored
+        being the ones expanded. """
+        w = self.width
+        h = self.dirtField.values
+        start = self.initial[1] * w + self.initial[0]
+        # a jump point is searched once per direction it is entered from, since that decides where it jumps next
+        # entries are (f, -g, cell, step), so ties on f go to the deeper entry
+        frontier = [(h[start], 0, start, None)]
+        best_g = {(start, None): 0}
+        parent = {(start, None): None}
+        explored = set()
+        while frontier:
+            f, g, i, step = heapq.heappop(frontier)
+            g = -g
+            if g > best_g[i, step]:
+                continue
+            if self.dirt[i]:
+                cells, key = [], (i, step)
+                while key is not None:
+                    cells.append(key[0])
+                    key = parent[key]
+                return node_from_actions(self, self.cell_path_actions(cells[::-1])), explored
+            explored.add((i % w, i // w))
+            for direction in self.jump_directions(i, step):
+                j = self.jump(i, direction)
+                if j is None:
+                    continue
+                gj = g + abs(j - i) // (w if abs(direction) == w else 1)
+                if gj < best_g.get((j, direction), np.inf):
+                    best_g[j, direction] = gj
+                    parent[j, direction] = (i, step)
+                    heapq.heappush(frontier, (gj + h[j], -gj, j, direction))
+            if stats is not None:
+                stats.expanded += 1
+                stats.frontier(len(frontier))
+        return None, None
+
+    def incremental_search(self, stats=None):
+        """ Plan with the DStarLite this problem keeps, explored being the cells whose distance changed."""
+        w = self.width
+        if self.dstar is None:
+            self.dstar = DStarLite(w, self.walls, self.dirt, self.steps)
+        cells, expanded = self.dstar.plan(self.initial[1] * w + self.initial[0], stats)
+        if cells is None:
+            return None, None
+        explored = {(i % w, i // w) for i in expanded if not self.dirt[i]}
+        return node_from_actions(self, self.cell_path_actions(cells)), explored
+
+    def wavefront_search(self, stats=None):
+        """ Breadth-first search a whole layer of rooms at a time with NumPy, then down the distances from the
+        dirty room it reached back to the agent. """
+        w = self.width
+        rooms = np.frombuffer(self.walls, dtype=np.uint8) == 0
+        dirty = np.frombuffer(self.dirt, dtype=np.uint8) != 0
+        steps = np.array(self.steps)
+        dist = np.full(len(self.walls), -1)
+        start = self.initial[1] * w + self.initial[0]
+        dist[start] = 0
+        layer, d = np.array([start]), 0
+        while layer.size and not dirty[layer].any():
+            d += 1
+            cells = np.unique((layer[:, None] + steps).ravel())
+            cells = cells[rooms[cells] & (dist[cells] < 0)]
+            dist[cells] = d
+            if stats is not None:
+                stats.expanded += layer.size
+                stats.frontier(cells.size)
+            layer = cells
+        if not layer.size:
+            return None, None
+        explored = {(i % w, i // w) for i in np.flatnonzero((dist >= 0) & ~dirty).tolist()}
+        i = int(layer[dirty[layer]][0])
+        cells = [i]
+        while dist[i] > 0:
+            i = next(i + step for step in self.steps if dist[i + step] == dist[i] - 1)
+            cells.append(i)
+        return node_from_actions(self, self.cell_path_actions(cells[::-1])), explored
 
     def actions(self, state):
         """ Return the actions that can be executed in the given state.
         The result would be a list, since there are only four possible actions
-        in any given state of the environment """
-
-        possible_neighbors = self.env.things_near(state)
-        possible_actions = ['UP', 'DOWN', 'LEFT', 'RIGHT']
-        for slot in possible_neighbors:
-            if isinstance(slot[0], Wall):
-                x, y = slot[0].location
-                if x == state[0] and y == state[1] + 1:
-                    possible_actions.remove('UP')
-                if x == state[0] and y == state[1] - 1:
-                    possible_actions.remove('DOWN')
-                if x == state[0] + 1 and y == state[1]:
-                    possible_actions.remove('RIGHT')
-                if x == state[0] - 1 and y == state[1]:
-                    possible_actions.remove('LEFT')
+        in any given state of the environment. The outer ring of walls keeps the
+        neighbour indices inside the grid. """
+
+        w = self.width
+        i = state[1] * w + state[0]
+        walls = self.walls
+        possible_actions = []
+        if not walls[i + w]:
+            possible_actions.append('UP')
+        if not walls[i - w]:
+            possible_actions.append('DOWN')
+        if not walls[i - 1]:
+            possible_actions.append('LEFT')
+        if not walls[i + 1]:
+            possible_actions.append('RIGHT')
 
         return possible_actions
 
     def result(self, state, action):
         """ Given state and action, return a new state that is the result of the action.
-        Action is assumed to be a valid action for the state """
-        self.agent.direction = action   
-        new_state = list(state)
-        if action == 'RIGHT':
-            new_state[0] += 1
-        elif action == 'LEFT':
-            new_state[0] -= 1
-        elif action == 'UP':
-            new_state[1] += 1
-        elif action == 'DOWN':
-            new_state[1] -= 1
-
-        return new_state
+        Action is assumed to be a valid action for the state. A state with a heading comes
+        back facing the direction of the move; a plain (x, y) location stays a location. """
+        dx, dy = actionDeltas[action]
+        if len(state) == 3:
+            return state[0] + dx, state[1] + dy, action
+        return state[0] + dx, state[1] + dy
 
     def goal_test(self, state):
         """ Given a state, return True if state is a goal state or False, otherwise """
-        return self.env.some_things_at(state, Dirt)
+        return self.dirt[state[1] * self.width + state[0]] != 0
 
-    def path_cost(self, curNode, state1, action, state2):
+    def path_cost(self, c, state1, action, state2):
         """To be used for UCS and A* search. Returns the cost of a solution path that arrives at state2 from
-        state1 via action, assuming it costs c to get up to state1. For our problem state is (x, y) coordinate pair. 
+        state1 via action, assuming it costs c to get up to state1. For our problem state is (x, y) coordinate pair,
+        or (x, y, heading) with turn cost on.
         Rotation of the Vacuum machine costs equivalent of 0.5 unit for each 90' rotation. """
         
-        action_cost = 1
-        
         if self.turnCostOn: # If TurnCost button is pressed, turning costs 0.5
-            if curNode.action != action and curNode.depth > 0:
-                if (curNode.action == "UP" and action == "DOWN") or (curNode.action == "DOWN" and action == "UP") or (curNode.action == "LEFT" and action == "RIGHT") or (curNode.action == "RIGHT" and action == "LEFT"):
-                    action_cost += 1
-                else:
-                    action_cost += 0.5
-        return curNode.path_cost + action_cost
+            return c + 1 + turnCosts[state1[2], action]
+        return c + 1
 
     def computeTurnCost(self, action1, action):
-        
-        action_cost = 1
-        
+        """ Cost of a move in direction action made by an agent heading in direction action1."""
         if self.turnCostOn:
-            if action1 != action:
-                if (action1 == "UP" and action == "DOWN") or (action1 == "DOWN" and action == "UP") or (action1 == "LEFT" and action == "RIGHT") or (action1 == "RIGHT" and action == "LEFT"):
-                    action_cost += 1
-                else:
-                    action_cost += 0.5
-                
-        return action_cost
-
-    def findMinManhattanDist(self, pos):
-        """find the min distance between position pos and any of the dirty rooms. Dirty rooms are maintained in
-        self.env.dirtyRooms."""
-        manhattanset = set()
-        for room in self.env.dirtyRooms:
-            manhattanset.add(abs(pos[0]-room[0]) + abs(pos[1]-room[1]))
-        return min(manhattanset)
-        
+            return 1 + turnCosts[action1, action]
+        return 1
+
     def h(self, node):
         """ Return the heuristic value for a given state. For this problem use minimum Manhattan 
-        distance to a dirty room, among all the dirty rooms.
+        distance to a dirty room, among all the dirty rooms. With turn cost on, each room's distance
+        also counts the turns the trip needs at least, which keeps h admissible.
+        The minimum is precomputed for every cell in self.dirtField, so this is one table read.
         """
-        return self.findMinManhattanDist(node.state)
-        
+        state = node.state
+        i = state[1] * self.width + state[0]
+        if self.turnCostOn:
+            return self.dirtField.values[i * len(headingIndex) + headingIndex[state[2]]]
+        return self.dirtField.values[i]
+
+
+class DirtDistanceField:
+    """ Heuristic table for VacuumPlanning. For every cell, and with turn cost on for every heading in that
+    cell, it holds the minimum over the dirty rooms of the Manhattan distance to the room plus, with turn cost,
+    the turns the trip needs at least: one 90' turn (0.5) for each direction it has to travel that the agent
+    is not facing yet. values is the table as a flat list, indexed by cell (cell * 4 + heading with turn cost).
+    As that cost is a part along x plus a part along y, the table is built by sweeps along the rows and then
+    the columns (see transform); sync relaxes the grid for a new dirty room, and for a cleaned one only
+    recomputes, in a window around them, the cells it was the nearest room to. """
+
+    # more dirty rooms than this added or cleaned at once, and sync builds the table anew
+    bulkChanges = 8
+
+    def __init__(self, width, height, turnAware=False):
+        self.width = width
+        self.height = height
+        self.turnAware = turnAware
+        self.ys, self.xs = np.divmod(np.arange(width * height), width)
+        layers = len(headingIndex) if turnAware else 1
+        self.field = np.full((width * height, layers), np.inf)
+        self.owner = np.full((width * height, layers), -1)   # cell index of the room giving the minimum
+        self.rooms = set()
+        self.values = self.field.ravel().tolist()
+
+    def sync(self, dirt):
+        """ Bring the table up to date with the dirt grid (a bytearray like VacuumEnvironment.dirt_grid)."""
+        rooms = set(np.flatnonzero(np.frombuffer(dirt, dtype=np.uint8)).tolist())
+        if rooms == self.rooms:
+            return
+        added, removed = rooms - self.rooms, self.rooms - rooms
+        self.rooms = rooms
+        if len(added) + len(removed) > self.bulkChanges:
+            self.field, self.owner = self.transform(0, self.height, 0, self.width)
+        else:
+            for room in removed:
+                self.remove_room(room)
+            for room in added:
+                self.relax(room, np.arange(len(self.field)))
+        self.values = self.field.ravel().tolist()
+
+    def transform(self, y0, y1, x0, x1):
+        """ (field, owner) of the window of rows y0..y1 - 1 and columns x0..x1 - 1 of the grid, counting only
+        the dirty rooms inside it, one row per cell of the window. The cost to a room is the sum of a cost
+        along x and one along y, so a sweep along each row both ways gives the least cost along x to each
+        cell, and a sweep along each column of those the table. """
+        rooms = np.fromiter(self.rooms, dtype=int, count=len(self.rooms))
+        ry, rx = np.divmod(rooms, self.width)
+        inside = (ry >= y0) & (ry < y1) & (rx >= x0) & (rx < x1)
+        value = np.full((y1 - y0, x1 - x0), np.inf)
+        owner = np.full((y1 - y0, x1 - x0), -1)
+        value[ry[inside] - y0, rx[inside] - x0] = 0
+        owner[ry[inside] - y0, rx[inside] - x0] = rooms[inside]
+
+        def cost(heading, direction):
+            return 0.5 if heading is not None and heading != direction else 0
+
+        across = self.sweep(value, owner, 1)
+        rows = {}
+        layers = []
+        for heading in (headingIndex if self.turnAware else [None]):
+            turns = (cost(heading, 'LEFT'), cost(heading, 'RIGHT'))
+            if turns not in rows:
+                row = self.combine(value, owner, across, turns)
+                rows[turns] = row, self.sweep(*row, 0)
+            row, along = rows[turns]
+            layers.append(self.combine(*row, along, (cost(heading, 'DOWN'), cost(heading, 'UP'))))
+        return (np.stack([v.ravel() for v, _ in layers], axis=1),
+                np.stack([o.ravel() for _, o in layers], axis=1))
+
+    @staticmethod
+    def sweep(value, owner, axis):
+        """ For each cell, the least value + distance over the cells before it along axis, and over those
+        after it, with the owners of those values: ((before, owner), (after, owner))."""
+        value, owner = np.moveaxis(value, axis, 0), np.moveaxis(owner, axis, 0)
+        result = []
+        for order in (range(1, len(value)), range(len(value) - 2, -1, -1)):
+            best = np.full(value.shape, np.inf)
+            best_owner = np.full(owner.shape, -1)
+            for k in order:
+                j = k - 1 if order.step == 1 else k + 1
+                take = value[j] < best[j]
+                best[k] = np.where(take, value[j], best[j]) + 1
+                best_owner[k] = np.where(take, owner[j], best_owner[j])
+            result.append((np.moveaxis(best, 0, axis), np.moveaxis(best_owner, 0, axis)))
+        return result
+
+    @staticmethod
+    def combine(value, owner, swept, turns):
+        """ The least of value and the two sides of swept, each side with its turn cost added."""
+        value, owner = value.copy(), owner.copy()
+        for (side, side_owner), turn in zip(swept, turns):
+            side = side + turn
+            better = side < value
+            value[better] = side[better]
+            owner[better] = side_owner[better]
+        return value, owner
+
+    def room_costs(self, room, cells):
+        """ Heuristic cost from each of cells (an index array) to room, one column per layer."""
+        dx = room % self.width - self.xs[cells]
+        dy = room // self.width - self.ys[cells]
+        dist = (np.abs(dx) + np.abs(dy)).astype(float)
+        if not self.turnAware:
+            return dist[:, None]
+        layers = []
+        for heading in headingIndex:
+            turns = (((dx > 0) & (heading != 'RIGHT')) | ((dx < 0) & (heading != 'LEFT'))).astype(float)
+            turns += ((dy > 0) & (heading != 'UP')) | ((dy < 0) & (heading != 'DOWN'))
+            layers.append(dist + 0.5 * turns)
+        return np.stack(layers, axis=1)
+
+    def relax(self, room, cells):
+        """ Lower the table entries of cells to their cost to room where that is smaller."""
+        cost = self.room_costs(room, cells)
+        field, owner = self.field[cells], self.owner[cells]
+        better = cost < field
+        field[better] = cost[better]
+        owner[better] = room
+        self.field[cells], self.owner[cells] = field, owner
+
+    def remove_room(self, room):
+        """ Recompute the cells room was the nearest dirty room to, room being out of self.rooms already. They
+        are recomputed in a window around them, widened until no room outside it could be any nearer. """
+        lost = np.flatnonzero((self.owner == room).any(axis=1))
+        if not len(lost):
+            return
+        ys, xs = self.ys[lost], self.xs[lost]
+        margin = 2
+        while True:
+            y0, y1 = max(ys.min() - margin, 0), min(ys.max() + 1 + margin, self.height)
+            x0, x1 = max(xs.min() - margin, 0), min(xs.max() + 1 + margin, self.width)
+            field, owner = self.transform(y0, y1, x0, x1)
+            k = (ys - y0) * (x1 - x0) + (xs - x0)
+            # a room outside the window is at least this far from each lost cell
+            bound = np.full(len(lost), np.inf)
+            for outside, gap in ((y0 > 0, ys - y0 + 1), (y1 < self.height, y1 - ys),
+                                 (x0 > 0, xs - x0 + 1), (x1 < self.width, x1 - xs)):
+                if outside:
+                    bound = np.minimum(bound, gap)
+            if (field[k] <= bound[:, None]).all():
+                break
+            margin *= 2
+        self.field[lost] = field[k]
+        self.owner[lost] = owner[k]
+
+
+class DStarLite:
+    """ D* Lite [Koenig and Likhachev 2002] from all the dirty rooms back to the agent: g[i] is the distance
+    from cell i to the nearest dirty room, rhs[i] its one-step lookahead. Kept between plans, so each plan only
+    repairs the distances the map edits since the last one affect. """
+
+    def __init__(self, width, walls, dirt, steps):
+        self.width = width
+        self.walls = walls      # the environment's grids, compared at each call with what the tables are for
+        self.dirt = dirt
+        self.steps = steps
+        n = len(walls)
+        self.g = [np.inf] * n
+        self.rhs = [np.inf] * n
+        # the grids the tables are for; nothing at first, so the first call sees every wall and dirty room
+        self.seenWalls = np.zeros(n, dtype=bool)
+        self.seenDirt = np.zeros(n, dtype=bool)
+        self.start = None
+        self.km = 0
+        self.frontier = IndexedPriorityQueue('min', self.key)
+
+    def h(self, i):
+        """ Manhattan distance from the agent to cell i."""
+        w = self.width
+        return abs(i % w - self.start % w) + abs(i // w - self.start // w)
+
+    def key(self, i):
+        m = min(self.g[i], self.rhs[i])
+        return m + self.h(i) + self.km, m
+
+    def update_cell(self, i):
+        """ Recompute rhs[i], and queue cell i if it is inconsistent (g[i] != rhs[i]). The agent's cell counts
+        as a room even if it holds a wall, as the agent can still move out of it."""
+        if self.walls[i] and i != self.start:
+            self.rhs[i] = np.inf
+        elif self.dirt[i]:
+            self.rhs[i] = 0
+        else:
+            g = self.g
+            self.rhs[i] = 1 + min(g[i + step] for step in self.steps)
+        if i in self.frontier:
+            del self.frontier[i]
+        if self.g[i] != self.rhs[i]:
+            self.frontier.append(i)
+
+    def update_around(self, i):
+        """ Update cell i and its neighbours, after something changed in cell i."""
+        self.update_cell(i)
+        for step in self.steps:
+            if 0 <= i + step < len(self.g):
+                self.update_cell(i + step)
+
+    def sync(self):
+        """ Update the cells whose wall or dirt changed since the last call."""
+        walls = np.frombuffer(self.walls, dtype=np.uint8) != 0
+        dirt = np.frombuffer(self.dirt, dtype=np.uint8) != 0
+        changed = np.flatnonzero((walls != self.seenWalls) | (dirt != self.seenDirt))
+        self.seenWalls, self.seenDirt = walls, dirt
+        g, rhs = self.g, self.rhs
+        for i in changed.tolist():
+            if walls[i] and g[i] == rhs[i] == np.inf:
+                continue    # a new wall where no distance was known changes nothing (the outer ring, at first)
+            self.update_around(i)
+
+    def plan(self, start, stats=None):
+        """ Return (cells, expanded): the cells of a shortest path from cell index start to a dirty room (None
+        if there is none) and the cells whose g changed. """
+        old = self.start
+        if old is not None:
+            self.km += abs(start % self.width - old % self.width) + abs(start // self.width - old // self.width)
+        self.start = start
+        self.sync()
+        if start != old:
+            for i in (old, start):
+                if i is not None and self.walls[i]:
+                    self.update_around(i)
+        g, rhs, frontier = self.g, self.rhs, self.frontier
+        expanded = set()
+        while frontier and (frontier.top()[0] < self.key(start) or rhs[start] != g[start]):
+            old_key, i = frontier.top()
+            frontier.pop()
+            new_key = self.key(i)
+            if old_key < new_key:
+                frontier.append(i)
+                continue
+            if g[i] > rhs[i]:
+                g[i] = rhs[i]
+                for step in self.steps:
+                    self.update_cell(i + step)
+            else:
+                g[i] = np.inf
+                self.update_around(i)
+            expanded.add(i)
+            if stats is not None:
+                stats.expanded += 1
+                stats.frontier(len(frontier))
+        if g[start] == np.inf:
+            return None, expanded
+        cells = [start]
+        while not self.dirt[cells[-1]]:
+            i = cells[-1]
+            cells.append(min((i + step for step in self.steps), key=g.__getitem__))
+        return cells, expanded
+
+
+class ReservationTable:
+    """ The rooms the agents of a fleet have claimed over time, for FleetPlanning's space-time A*. Time t is the
+    t-th step of the plan. cells maps (cell index, t) to the agent in that cell at time t, moves maps (i, j, t),
+    a move from cell i at time t to cell j at t + 1, to the agent making it (so that no two agents swap rooms),
+    and parked maps a cell to (t, agent) when agent stays there from time t on. lastUse[i] is the last time an
+    agent is in cell i but for a parked one, and horizon the last time anything is reserved: after it, only
+    the parked agents are left. """
+
+    def __init__(self):
+        self.cells = {}
+        self.moves = {}
+        self.parked = {}
+        self.lastUse = {}
+        self.horizon = 0
+
+    def can_move(self, agent, i, j, t):
+        """ Whether agent can go from cell i at time t to cell j at t + 1 (i == j to stay)."""
+        if self.cells.get((j, t + 1), agent) is not agent:
+            return False
+        park = self.parked.get(j)
+        if park is not None and park[1] is not agent and park[0] <= t + 1:
+            return False
+        return i == j or self.moves.get((j, i, t), agent) is agent
+
+    def can_park(self, agent, i, t):
+        """ Whether agent, in cell i at time t, can stay there for good."""
+        park = self.parked.get(i)
+        return (park is None or park[1] is agent) and self.lastUse.get(i, -1) < t
+
+    def park(self, agent, i, t):
+        self.parked[i] = (t, agent)
+        self.horizon = max(self.horizon, t)
+
+    def unpark(self, i):
+        del self.parked[i]
+
+    def reserve(self, agent, cells, t0=0):
+        """ Claim the cells agent is in at times t0, t0 + 1, ..., and park it in the last one."""
+        for k, i in enumerate(cells):
+            t = t0 + k
+            self.cells[i, t] = agent
+            self.lastUse[i] = max(self.lastUse.get(i, -1), t)
+            if k and cells[k - 1] != i:
+                self.moves[cells[k - 1], i, t - 1] = agent
+        self.park(agent, cells[-1], t0 + len(cells) - 1)
+
+
+class FleetPlanning(VacuumPlanning):
+    """ Cleaning with several agents at once. The dirty rooms are first shared out among the agents by
+    allocate_goals over the breadth-first distances of the map, with the Hungarian method run in rounds or
+    with an auction (see assignments). Then each agent in turn, the one with the longest route first, plans
+    its route with space-time A* (a state being a room and a time step), around the rooms the agents before
+    it have claimed in a ReservationTable, so that no two agents are ever in the same room or swap rooms.
+
+    Until its turn comes, an agent counts as parked where it stands; so it can always stay there, and once an
+    agent has cleaned a room it only goes on if it can still find a room to stay in afterwards. A dirty room an
+    agent cannot get to this way is left for the next plan. Every action, moving, waiting ('NoOp') or sucking,
+    takes one time step, so the longest route is the time it takes the fleet to clean; turn cost is not taken
+    into account. generateSolution hands the routes, {agent: list of actions}, to env.set_routes. """
+
+    assignments = ['Hungarian', 'Auction']
+
+    def __init__(self, env, agents=None, assignment='Hungarian'):
+        super().__init__(env, 'Fleet')
+        self.agents = list(env.agents if agents is None else agents)
+        self.assignment = assignment
+        self.stepNames = dict(zip(self.steps, actionDeltas))
+
+    def generateSolution(self):
+        """ Plan the routes of every agent from where they are now, and pass them to the environment."""
+        self.env.read_env()
+        self.mapVersion = (self.env.wall_version, self.env.dirt_version)
+        starts = tuple(self.env.cell_index(agent.location) for agent in self.agents)
+        key = ('Fleet', self.assignment, starts) + self.mapVersion
+        if key in self.planCache:
+            routes, explored = self.planCache.get(key)
+        else:
+            routes, explored = self.plan()
+            self.planCache.put(key, (routes, explored))
+        self.env.set_routes({agent: list(route) for agent, route in zip(self.agents, routes)})
+        self.env.display_explored(explored)
+
+    def plan(self):
+        """ Allocate the dirty rooms and plan every agent's route. Returns (routes, explored): the list of
+        actions of each agent of self.agents, and the rooms the searches expanded. """
+        stats = self.stats
+        starts = [self.env.cell_index(agent.location) for agent in self.agents]
+        rooms = [i for i, d in enumerate(self.dirt) if d]
+        self.fieldCache.maxsize = max(self.fieldCache.maxsize, len(starts) + len(rooms))
+        dist = np.array([field[rooms] for field in self.distance_fields(starts + rooms, stats)], dtype=float)
+        dist[dist < 0] = np.inf
+        start_dist, goal_dist = dist[:len(starts)].tolist(), dist[len(starts):].tolist()
+        allocation = allocate_goals(start_dist, goal_dist, self.assignment.lower())
+
+        table = ReservationTable()
+        for k, agent in enumerate(self.agents):
+            table.park(agent, starts[k], 0)
+        order = sorted(range(len(self.agents)),
+                       key=lambda k: -route_cost(start_dist, goal_dist, k, allocation[k]))
+        routes = [None] * len(self.agents)
+        explored = set()
+        for k in order:
+            agent = self.agents[k]
+            table.unpark(starts[k])
+            cells, routes[k] = self.plan_agent(agent, starts[k], [rooms[g] for g in allocation[k]], table,
+                                               explored, stats)
+            table.reserve(agent, cells)
+        w = self.width
+        return routes, {(i % w, i // w) for i in explored if not self.dirt[i]}
+
+    def plan_agent(self, agent, start, rooms, table, explored, stats=None):
+        """ Plan the route of agent from cell start through the cell indices rooms in order, around what is
+        claimed in table. Returns (cells, actions): the cell the agent is in at each time step from 0 on, and
+        the actions that take it there, ending in a room where it can stay. """
+        cells, actions = [start], []
+        rest = self.space_time_search(agent, start, 0, None, table, explored, stats)
+        for room in rooms:
+            leg = self.space_time_search(agent, cells[-1], len(cells) - 1, room, table, explored, stats)
+            if leg is None:
+                continue
+            leg.append(room)    # the time step it takes to suck
+            after = self.space_time_search(agent, room, len(cells) + len(leg) - 2, None, table, explored, stats)
+            if after is None:
+                continue
+            actions += self.leg_actions(leg[:-1]) + ['Suck']
+            cells += leg[1:]
+            rest = after
+        actions += self.leg_actions(rest)
+        cells += rest[1:]
+        return cells, actions
+
+    def leg_actions(self, cells):
+        """ The actions that take an agent through cells, one cell per time step."""
+        return [self.stepNames[j - i] if j != i else 'NoOp' for i, j in zip(cells, cells[1:])]
+
+    def space_time_search(self, agent, start, t0, goal, table, explored, stats=None):
+        """ Space-time A* for agent from cell start at time t0 to cell index goal, arriving at a time it can
+        stay there for the next step too (to suck), or, if goal is None, to the nearest room it can stay in for
+        good. A state is a (cell, time) pair; the moves and waits in place the table does not allow are left
+        out. The heuristic is the breadth-first distance to goal, which ignores the other agents. After
+        table.horizon nothing changes any more, so states later than that are told apart by cell only, which
+        keeps the search finite. Returns the cells the agent is in at times t0, t0 + 1, ... up to the
+        goal, or None; the cells expanded are added to explored. """
+        if goal is None:
+            dist = None
+        else:
+            dist = self.distance_field(goal, stats).tolist()
+            if dist[start] < 0:
+                return None
+        walls = self.walls
+        steps = self.steps + [0]
+        last = table.horizon + 1
+        frontier = [(t0 + (dist[start] if dist else 0), -t0, start, t0)]
+        parent = {(start, min(t0, last)): None}
+        while frontier:
+            _, _, i, t = heapq.heappop(frontier)
+            if (i == goal and table.can_move(agent, i, i, t)) or (goal is None and table.can_park(agent, i, t)):
+                cells = [i]
+                state = parent[i, min(t, last)]
+                while state is not None:
+                    cells.append(state[0])
+                    state = parent[state[0], min(state[1], last)]
+                return cells[::-1]
+            explored.add(i)
+            if stats is not None:
+                stats.expanded += 1
+            for step in steps:
+                j = i + step
+                if walls[j] or not table.can_move(agent, i, j, t):
+                    continue
+                key = (j, min(t + 1, last))
+                if key in parent or (dist is not None and dist[j] < 0):
+                    continue
+                parent[key] = (i, t)
+                heapq.heappush(frontier, (t + 1 + (dist[j] if dist else 0), -t - 1, j, t + 1))
+                if stats is not None:
+                    stats.generated += 1
+            if stats is not None:
+                stats.frontier(len(frontier))
+        return None
+
+
+def random_free_rooms(env, count, rnd=random):
+    """ count rooms of env (fewer if there are not as many) with nothing in them, drawn with the random
+    generator rnd. For a given state of rnd, the rooms drawn for count are the first of those for more. """
+    rooms = [(x, y) for y in range(1, env.height - 1) for x in range(1, env.width - 1)
+             if not env.some_things_at((x, y))]
+    rnd.shuffle(rooms)
+    return rooms[:count]
+
 
 # ______________________________________________________________________________
 
@@ -183,8 +1008,14 @@ def is_agent_label(lbl):
 class Gui(VacuumEnvironment):
     """This is a two-dimensional GUI environment. Each location may be
     dirty, clean or can have a wall. The user can change these at each step.
+    The rooms are drawn through paint, which keeps a copy of every button's
+    color and label and only passes what changes on to Tk, in one go at the
+    next flush.
+    With more than one agent (see setFleetSize) the agents clean together,
+    along the routes FleetPlanning plans for them.
     """
     xi, yi = (0, 0)
+    expansionsPerRedraw = 25    # see show_expansion
 
     #perceptible_distance = 1
 
@@ -198,11 +1029,21 @@ class Gui(VacuumEnvironment):
         self.solution = None
         self.searchAgent = None
         self.turnCostOn = False
+        self.fleet = []             # the agents that clean: self.agent, then the extra ones of setFleetSize
+        self.fleetSize = 1
+        self.routes = None          # {agent: actions left} while a fleet cleans
+        self.routesVersion = None   # (wall version, dirt version) the routes were last followed on
         print("creating xv with width ={} and height={}".format(width, height))
         super().__init__(width, height)
 
         self.agent = None
         self.root = root
+        # copies of the buttons' colors and labels, by cell index y * width + x; see paint
+        self.colors = None
+        self.labels = None
+        self.pending = {}       # cell index: the options of its button still to be set by flush
+        self.unread = set()     # cells whose color changed since the last read_env
+        self.shaded = set()     # cells colored pink or orange to show a search
         self.create_frames(height)
         self.create_buttons(width)
         self.create_walls()
@@ -218,11 +1059,10 @@ class Gui(VacuumEnvironment):
             xi, yi = theAgent.location
             self.add_agent(theAgent, (yi, xi))
         else:
-            self.agent.location = [xi, yi]
+            self.move_to(self.agent, [xi, yi])
             xi, yi = self.agent.location
             self.agent.direction = 'UP'
-            self.buttons[yi][xi].config(bg='white', text='', state='normal')
-            self.buttons[yi][xi].config(bg='white', text=agent_label(self.agent), state='normal')
+            self.paint(xi, yi, 'white', agent_label(self.agent), state='normal')
             #if len(self.agents) == 0:
             #    self.add_agent(self.agent, (yi, xi))
         
@@ -240,7 +1080,7 @@ class Gui(VacuumEnvironment):
             while(rownum ==yi and colnum==xi):
                 rownum = random.choice(range(1, self.height - 1))
                 colnum = random.choice(range(1, self.width - 1))
-            self.buttons[rownum][colnum].config(bg='red', text='W', disabledforeground='black')
+            self.paint(colnum, rownum, 'red', 'W', disabledforeground='black')
 
         self.create_dirts()
         self.stepCount = 0
@@ -248,6 +1088,7 @@ class Gui(VacuumEnvironment):
         self.solution = []
         self.explored = set()
         self.read_env()
+        self.flush()
 
     def create_frames(self, h):
         """Adds h row frames to the GUI environment."""
@@ -260,14 +1101,42 @@ class Gui(VacuumEnvironment):
     def create_buttons(self, w):
         """Adds w buttons to the respective row frames in the GUI."""
         self.buttons = []
-        for frame in self.frames:
+        for y, frame in enumerate(self.frames):
             button_row = []
-            for _ in range(w):
+            for x in range(w):
                 button = Button(frame, bg='white', state='normal', height=1, width=1, padx=1, pady=1)
-                button.config(command=lambda btn=button: self.toggle_element(btn))
+                button.config(command=lambda x=x, y=y: self.toggle_element(x, y))
                 button.pack(side='left')
                 button_row.append(button)
             self.buttons.append(button_row)
+        self.colors = ['white'] * (w * len(self.frames))
+        self.labels = [''] * (w * len(self.frames))
+
+    def paint(self, x, y, bg=None, text=None, **options):
+        """ Set the color bg and the label text of room (x, y), and any other options of its button. Only
+        the color and label that change, and the other options, are kept for flush to set, so a room
+        painted several times in between is configured once. read_env reads the colors from here rather
+        than from the buttons. """
+        i = y * self.width + x
+        if bg is not None and bg != self.colors[i]:
+            self.colors[i] = bg
+            options['bg'] = bg
+            self.unread.add(i)
+            if bg in ('pink', 'orange'):
+                self.shaded.add(i)
+            else:
+                self.shaded.discard(i)
+        if text is not None and text != self.labels[i]:
+            self.labels[i] = text
+            options['text'] = text
+        if options:
+            self.pending.setdefault(i, {}).update(options)
+
+    def flush(self):
+        """ Pass the changes collected by paint on to the buttons."""
+        for i, options in self.pending.items():
+            self.buttons[i // self.width][i % self.width].config(**options)
+        self.pending.clear()
 
 
     def create_walls(self):
@@ -275,11 +1144,11 @@ class Gui(VacuumEnvironment):
         internal blocks of walls."""
         for row, button_row in enumerate(self.buttons):
             if row == 0 or row == len(self.buttons) - 1:
-                for button in button_row:
-                    button.config(bg='red', text='W', state='disabled', disabledforeground='black')
+                for col in range(len(button_row)):
+                    self.paint(col, row, 'red', 'W', state='disabled', disabledforeground='black')
             else:
-                button_row[0].config(bg='red', text='W', state='disabled', disabledforeground='black')
-                button_row[len(button_row) - 1].config(bg='red', text='W', state='disabled', disabledforeground='black')
+                self.paint(0, row, 'red', 'W', state='disabled', disabledforeground='black')
+                self.paint(len(button_row) - 1, row, 'red', 'W', state='disabled', disabledforeground='black')
 
     def create_dirts(self):
         """ set a small random number of rooms to be dirty at random location on the grid
@@ -296,24 +1165,32 @@ class Gui(VacuumEnvironment):
             colnum = random.choice(range(1, self.width-1))
             if self.some_things_at((colnum, rownum)):
                 continue
-            self.buttons[rownum][colnum].config(bg='grey')
+            self.paint(colnum, rownum, 'grey')
             dirtCreated += 1
             self.dirtyRooms.add((colnum, rownum))
 
     def setSearchEngine(self, choice):
         """sets the chosen search engine for solving this problem"""
         self.searchType = choice
+        if self.routes is not None:
+            print("a fleet plans with space-time A*; {} is used with one agent".format(choice))
+            return
         self.searchAgent = VacuumPlanning(self, self.searchType)
+        self.searchAgent.observer = self.show_expansion
         self.searchAgent.generateSolution()
         self.done = False
 
     def set_solution(self, path):
+        self.solution = []
+        self.path = []
+        if path is None:
+            print("There is no solution!\n")
+            return
         sol = path.solution()
         self.solution = list(reversed(sol))
-        self.path = []
         if(self.agent == None):
             return
-        while(path.state != self.agent.location):
+        while path.parent is not None:     # a tour may pass the start again, so walk up to the root
             self.path.append(path.state)
             path = path.parent
         if(len(self.path)>0):
@@ -321,42 +1198,117 @@ class Gui(VacuumEnvironment):
 
 
 
-    def display_explored(self, explored):
-        """display explored slots in a light pink color"""
-        if len(self.explored) > 0:   # means we have explored list from previous search. So need to clear their visual fist
-            for (x, y) in self.explored:
-                self.buttons[y][x].config(bg='white')
+    def setFleetSize(self, count):
+        """ Clean with count agents: self.agent and count - 1 more in random free rooms, planned together by
+        FleetPlanning. Back to one agent, the chosen search engine plans again. """
+        self.fleetSize = int(count)
+        self.read_env()
+        self.remove_fleet()
+        for location in random_free_rooms(self, self.fleetSize - 1):
+            agt = XYSearchAgent(program=XYSearchAgentProgram, loc=location)
+            agt.direction = 'UP'
+            self.add_thing(agt, location)
+            self.paint(location[0], location[1], 'white', agent_label(agt), state='normal')
+            self.fleet.append(agt)
+        self.flush()
+        if self.fleetSize > 1:
+            self.searchAgent = FleetPlanning(self, self.fleet)
+            self.searchAgent.generateSolution()
+            self.done = False
+        elif self.searchType is not None:
+            self.setSearchEngine(self.searchType)
+
+    def remove_fleet(self):
+        """ Take away the agents setFleetSize added, leaving self.agent alone."""
+        for agt in self.fleet[1:]:
+            x, y = agt.location
+            self.delete_thing(agt)
+            self.paint(x, y, text='')
+        self.fleet = [self.agent]
+        self.routes = None
+        self.solution = []
 
-        # now pink color the new explored list
-        self.explored = explored
-        for (x, y) in explored:
-            self.buttons[y][x].config(bg='pink')
+    def set_routes(self, routes):
+        """ Follow the routes of a fleet; self.path gets the rooms they go through, for display_explored."""
+        self.routes = routes
+        self.routesVersion = (self.wall_version, self.dirt_version)
+        self.solution = []
+        self.path = []
+        for agt, route in routes.items():
+            x, y = agt.location
+            for action in route:
+                if action in actionDeltas:
+                    x, y = x + actionDeltas[action][0], y + actionDeltas[action][1]
+                    self.path.append((x, y))
+
+    def fleet_step(self):
+        """ One action of every agent of the fleet. The routes are planned again first if the map was edited
+        since the last step, or if they are done while there is still dirt. """
+        if (self.wall_version, self.dirt_version) != self.routesVersion or not any(self.routes.values()):
+            self.searchAgent.generateSolution()
+        for agt, route in self.routes.items():
+            if route:
+                self.execute_action(agt, route.pop(0))
+        self.routesVersion = (self.wall_version, self.dirt_version)
+
+    def show_expansion(self, event):
+        """Observer of the searches that report their progress: colors each room pink as it is expanded,
+        redrawing the grid every expansionsPerRedraw expansions, so the search can be watched as it spreads.
+        display_explored then shows the final result as usual."""
+        if event.kind != 'expand':
+            return
+        x, y, *_ = event.node.state
+        if not self.dirt_grid[y * self.width + x]:
+            self.paint(x, y, 'pink')
+        if len(event.explored) % self.expansionsPerRedraw == 0:
+            self.flush()
+            self.root.update_idletasks()
 
-        # finally color orange the found path
-        for (x, y) in self.path:
-            self.buttons[y][x].config(bg='orange')
+    def display_explored(self, explored):
+        """display explored slots in a light pink color, and the path found in orange. Only the rooms whose
+        color changes from what is shown now are repainted."""
+        # Dirty rooms keep their color: read_env reads the dirt back from it, and a tour's explored set and
+        # path run through dirty rooms.
+        self.explored = explored
+        if explored is None:
+            print("There is not explored list!\n")
+            explored = set()
+        shades = {}
+        for (x, y, *_) in explored:
+            shades[y * self.width + x] = 'pink'
+        for (x, y, *_) in self.path:
+            shades[y * self.width + x] = 'orange'
+        for i in self.shaded - shades.keys():
+            self.paint(i % self.width, i // self.width, 'white')
+        for i, shade in shades.items():
+            if not self.dirt_grid[i]:
+                self.paint(i % self.width, i // self.width, shade)
+        self.flush()
 
     def add_agent(self, agt, loc):
         """add an agent to the GUI"""
         self.add_thing(agt, loc)
         # Place the agent at the provided location.
         lbl = agent_label(agt)
-        self.buttons[loc[1]][loc[0]].config(bg='white', text=lbl, state='normal')
+        self.paint(loc[0], loc[1], 'white', lbl, state='normal')
+        self.flush()
         self.agent = agt
+        self.fleet = [agt]
 
-    def toggle_element(self, button):
-        """toggle the element type on the GUI when a room is clicked"""
-        bgcolor = button['bg']
-        txt = button['text']
+    def toggle_element(self, x, y):
+        """toggle the element type on the GUI when room (x, y) is clicked"""
+        bgcolor = self.colors[y * self.width + x]
+        txt = self.labels[y * self.width + x]
         if is_agent_label(txt):
             return
         else:
             if bgcolor == 'red':
-                button.config(bg='grey', text='')
+                self.paint(x, y, 'grey', '')
             elif bgcolor == 'grey':
-                button.config(bg='white', text='', state='normal')
+                self.paint(x, y, 'white', '', state='normal')
             elif bgcolor == 'white':
-                button.config(bg='red', text='W')
+                self.paint(x, y, 'red', 'W')
+            self.flush()
 
     def removeDirtyRoom(self, loc):
         for room in self.dirtyRooms:
@@ -376,39 +1328,46 @@ class Gui(VacuumEnvironment):
             dirt_list = self.list_things_at(agent.location, Dirt)
             if dirt_list:
                 dirt = dirt_list[0]
-                if self.buttons[yi][xi]['bg'] != 'grey':
+                if self.colors[yi * self.width + xi] != 'grey':
                     print("Error!: execute_action: mismatch with dirty room color")
                 agent.performance += 10
 
                 self.delete_thing(dirt)
                 self.removeDirtyRoom(agent.location) 
-                self.buttons[yi][xi].config(bg='white', state='normal')
-        else:   # means action == 'Move'
-            agent.location = self.searchAgent.result(agent.location, action)
+                self.paint(xi, yi, 'white', state='normal')
+        elif action != 'NoOp':   # means action is a move
+            self.move_to(agent, self.searchAgent.result(agent.location, action))
+            agent.direction = action
             #self.agent.moveCost(xi, yi)
-            self.buttons[yi][xi].config(text='')
+            self.paint(xi, yi, text='')
             xf, yf = agent.location
-            self.buttons[yf][xf].config(text=agent_label(agent))
+            self.paint(xf, yf, text=agent_label(agent))
 
+        self.flush()
         NumSteps_label.config(text=str(self.stepCount))
-        TotalCost_label.config(text=str(agent.performance))
+        TotalCost_label.config(text=str(sum(agt.performance for agt in self.fleet)))
 
     def read_env(self):
         """read_env: This sets proper wall or Dirt status based on bg color"""
-        """Reads the current state of the GUI environment."""
-        self.dirtCount = 0
-        for j, btn_row in enumerate(self.buttons):
-            for i, btn in enumerate(btn_row):
-                if (j != 0 and j != len(self.buttons) - 1) and (i != 0 and i != len(btn_row) - 1):
-                    if self.some_things_at((i, j)):  # and (i, j) != agt_loc:
-                        for thing in self.list_things_at((i, j)):
-                            if not isinstance(thing, Agent):
-                                self.delete_thing(thing)
-                    if btn['bg'] == 'grey':  # adding dirt
-                        self.add_thing(Dirt(), (i, j))
-                        self.dirtCount += 1
-                    elif btn['bg'] == 'red':  # adding wall
-                        self.add_thing(Wall(), (i, j))
+        """Reads the current state of the GUI environment. Only the rooms painted a
+        new color since the last call are looked at, and those whose Wall or Dirt
+        already matches their color are left alone."""
+        self.dirtCount = self.colors.count('grey')
+        for cell in self.unread:
+            i, j = cell % self.width, cell // self.width
+            if (j != 0 and j != self.height - 1) and (i != 0 and i != self.width - 1):
+                bgcolor = self.colors[cell]
+                wanted = Dirt if bgcolor == 'grey' else Wall if bgcolor == 'red' else None
+                things = [thing for thing in self.list_things_at((i, j)) if not isinstance(thing, Agent)]
+                if wanted is None and not things:
+                    continue
+                if wanted is not None and len(things) == 1 and type(things[0]) is wanted:
+                    continue
+                for thing in things:
+                    self.delete_thing(thing)
+                if wanted is not None:
+                    self.add_thing(wanted(), (i, j))
+        self.unread.clear()
 
     def update_env(self):
         """Updates the GUI environment according to the current state."""
@@ -424,6 +1383,10 @@ class Gui(VacuumEnvironment):
             self.done = True
             return
 
+        if self.routes is not None:
+            self.fleet_step()
+            return
+
         if len(self.solution) == 0: # agent has reached a dirty room. So the proper action is 'suck'
             self.execute_action(self.agent, 'Suck')
             self.read_env()
@@ -451,17 +1414,18 @@ class Gui(VacuumEnvironment):
         #self.turnCostOn = False
         NumSteps_label.config(text=str(0))
         TotalCost_label.config(text=str(0))
+        self.remove_fleet()
 
-
-        for j, btn_row in enumerate(self.buttons):
-            for i, btn in enumerate(btn_row):
-                if (j != 0 and j != len(self.buttons) - 1) and (i != 0 and i != len(btn_row) - 1):
-                    if self.some_things_at((i, j)):
-                        for thing in self.list_things_at((i, j)):
-                            self.delete_thing(thing)
-                    btn.config(bg='white', text='', state='normal')
+        for j in range(1, self.height - 1):
+            for i in range(1, self.width - 1):
+                for thing in self.list_things_at((i, j)):
+                    if not isinstance(thing, Agent):    # the agent is moved back by setupTestEnvironment
+                        self.delete_thing(thing)
+                self.paint(i, j, 'white', '')
 
         self.setupTestEnvironment()
+        if self.fleetSize > 1:
+            self.setFleetSize(self.fleetSize)
 
     def switchTurnCost(self):
         """enables / disables turn cost of 1 for each 90' turn of the agent"""
@@ -472,7 +1436,10 @@ class Gui(VacuumEnvironment):
             self.turnCostOn = False
             turn_button.config(bg = "grey")
         #self.reset_env()
+        if self.routes is not None:     # a fleet does not take turn cost into account
+            return
         self.searchAgent = VacuumPlanning(self, self.searchType)
+        self.searchAgent.observer = self.show_expansion
         self.searchAgent.generateSolution()
         self.done = False
         
@@ -497,6 +1464,189 @@ class XYSearchAgent(Agent):
         self.stepCount = 0
 
 
+class HeadlessVacuumEnvironment(VacuumEnvironment):
+    """The vacuum world without the GUI, so the planners can run in batch (see vacuum_benchmark.py).
+    Walls and dirt are only things in the environment; build one from a map with from_text, from_cells or
+    load, or a random one like the GUI's test environment with from_seed. A VacuumPlanning on it leaves its
+    result in self.path (the goal node) and self.explored, both None, quietly, if it finds no plan.
+
+    In a text map each line is a row, the top row (largest y) first: '#' is a wall, '*' a dirty room, 'A' an
+    agent in a clean room, '+' an agent in a dirty room, '@' an agent on a wall and '.' a clean room. The
+    outer ring is always walls, whatever the map says. The same map as a NumPy array of cells (see from_cells) holds the codes of mapCodes instead of the symbols,
+    and is kept in .npy files; save and load use one or the other format by the file name.
+
+    With several agents, FleetPlanning leaves the routes it plans in self.routes, and run_routes carries
+    them out. """
+
+    mapSymbols = {'#': Wall, '*': Dirt, 'A': None, '+': Dirt, '@': Wall, '.': None}
+    mapCodes = {'.': 0, '#': 1, '*': 2, 'A': 3, '+': 4, '@': 5}
+    # bytes.translate tables between the symbols of a text map and the codes of an array of cells
+    symbolsToCodes = bytes.maketrans(b'.#*A+@', bytes([0, 1, 2, 3, 4, 5]))
+    codesToSymbols = bytes.maketrans(bytes([0, 1, 2, 3, 4, 5]), b'.#*A+@')
+
+    def __init__(self, width, height, turnCostOn=False):
+        super().__init__(width, height)
+        self.turnCostOn = turnCostOn
+        self.agent = None
+        self.path = None
+        self.explored = None
+        self.routes = None
+
+    @classmethod
+    def from_text(cls, text, turnCostOn=False):
+        """ Build the environment a text map describes."""
+        rows = [line.strip() for line in text.strip().splitlines()]
+        width, height = len(rows[0]), len(rows)
+        if any(len(row) != width for row in rows):
+            raise ValueError("rows of a map must all have the same length")
+        symbols = ''.join(rows)
+        if not set(symbols) <= cls.mapSymbols.keys():
+            i = next(i for i, symbol in enumerate(symbols) if symbol not in cls.mapSymbols)
+            raise ValueError("unknown map symbol {!r} at ({}, {})".format(symbols[i], i % width,
+                                                                          height - 1 - i // width))
+        cells = np.frombuffer(symbols.encode('ascii').translate(cls.symbolsToCodes), dtype=np.uint8)
+        return cls.from_cells(cells.reshape(height, width), turnCostOn)
+
+    @classmethod
+    def from_cells(cls, cells, turnCostOn=False):
+        """ Build the environment of a height x width array of the codes of mapCodes, the top row first like
+        a text map. The walls and dirt are loaded in bulk (see VacuumEnvironment.load_grids). There is an
+        agent at each 'A', '+' and '@'; self.agent is the one in the top row, leftmost. """
+        cells = np.asarray(cells)
+        height, width = cells.shape
+        if cells.size and (cells.min() < 0 or cells.max() > 5):
+            raise ValueError("map cells must be codes of HeadlessVacuumEnvironment.mapCodes")
+        rows = cells[::-1]      # row y of the grids
+        inner = np.zeros((height, width), dtype=bool)
+        inner[1:-1, 1:-1] = True
+        walls = (rows == cls.mapCodes['#']) | (rows == cls.mapCodes['@']) | ~inner
+        dirt = ((rows == cls.mapCodes['*']) | (rows == cls.mapCodes['+'])) & inner
+        agents = np.argwhere(np.isin(cells, [cls.mapCodes['A'], cls.mapCodes['+'], cls.mapCodes['@']]))
+        if not len(agents):
+            raise ValueError("the map has no agent ('A', '+' or '@')")
+        env = cls(width, height, turnCostOn)
+        env.load_grids(walls.tobytes(), dirt.tobytes())
+        for j, x in agents.tolist():
+            env.place_agent((x, height - 1 - j))
+        env.agent = env.agents[0]
+        return env
+
+    @classmethod
+    def load(cls, path, turnCostOn=False):
+        """ Build the environment of the map in the file path: an array of cells if it is a .npy file, a
+        text map otherwise. """
+        if path.endswith('.npy'):
+            return cls.from_cells(np.load(path), turnCostOn)
+        with open(path) as f:
+            return cls.from_text(f.read(), turnCostOn)
+
+    @classmethod
+    def from_seed(cls, width, height, seed=None, dirtCount=5, turnCostOn=False):
+        """ Build a random environment the way Gui.setupTestEnvironment does: the agent in the middle, between
+        a seventh and a third of the rooms walled, and dirtCount dirty rooms. The same seed gives the same map."""
+        rnd = random.Random(seed)
+        env = cls(width, height, turnCostOn)
+        xi, yi = width // 2, height // 2
+        env.place_agent((xi, yi))
+        roomCount = (width - 1) * (height - 1)
+        blockCount = rnd.choice(range(roomCount // 7, roomCount // 3))
+        for _ in range(blockCount):
+            rownum = rnd.choice(range(1, height - 1))
+            colnum = rnd.choice(range(1, width - 1))
+            while rownum == yi and colnum == xi:
+                rownum = rnd.choice(range(1, height - 1))
+                colnum = rnd.choice(range(1, width - 1))
+            if not env.some_things_at((colnum, rownum), Wall):
+                env.add_thing(Wall(), (colnum, rownum))
+        freeRooms = sum(1 for x in range(1, width - 1) for y in range(1, height - 1) if not env.some_things_at((x, y)))
+        dirtCreated = 0
+        while dirtCreated < min(dirtCount, freeRooms):
+            rownum = rnd.choice(range(1, height - 1))
+            colnum = rnd.choice(range(1, width - 1))
+            if env.some_things_at((colnum, rownum)):
+                continue
+            env.add_thing(Dirt(), (colnum, rownum))
+            dirtCreated += 1
+        return env
+
+    def to_cells(self):
+        """ The array of cells of the environment, as from_cells reads it."""
+        cells = np.zeros(self.width * self.height, dtype=np.uint8)
+        cells[np.frombuffer(self.dirt_grid, dtype=np.uint8) > 0] = self.mapCodes['*']
+        cells[np.frombuffer(self.wall_grid, dtype=np.uint8) > 0] = self.mapCodes['#']
+        for agent in self.agents:
+            i = self.cell_index(agent.location)
+            cells[i] = self.mapCodes['@' if self.wall_grid[i] else '+' if self.dirt_grid[i] else 'A']
+        return cells.reshape(self.height, self.width)[::-1]
+
+    def to_text(self):
+        """ The text map of the environment, as from_text reads it."""
+        symbols = np.ascontiguousarray(self.to_cells()).tobytes().translate(self.codesToSymbols).decode('ascii')
+        return ''.join(symbols[j:j + self.width] + '\n' for j in range(0, len(symbols), self.width))
+
+    def save(self, path):
+        """ Write the map of the environment to the file path, as an array of cells if it is a .npy file and
+        as a text map otherwise. """
+        if path.endswith('.npy'):
+            np.save(path, self.to_cells())
+        else:
+            with open(path, 'w') as f:
+                f.write(self.to_text())
+
+    def place_agent(self, location):
+        """ Put a new XYSearchAgent, heading up, at location."""
+        self.agent = XYSearchAgent(program=XYSearchAgentProgram, loc=location)
+        self.agent.direction = 'UP'
+        self.add_thing(self.agent, location)
+
+    def scatter_agents(self, count, seed=None):
+        """ Add agents in random free rooms (see random_free_rooms) until there are count of them. self.agent
+        stays the first one."""
+        first = self.agents[0] if self.agents else None
+        for location in random_free_rooms(self, count - len(self.agents), random.Random(seed)):
+            self.place_agent(location)
+        self.agent = first or self.agent
+
+    def execute_action(self, agent, action):
+        """ The moves are those of actionDeltas; the other actions ('Suck', 'NoOp') are VacuumEnvironment's."""
+        if action in actionDeltas:
+            dx, dy = actionDeltas[action]
+            self.move_to(agent, (agent.location[0] + dx, agent.location[1] + dy))
+            agent.direction = action
+        else:
+            super().execute_action(agent, action)
+
+    def run_routes(self):
+        """ Carry out self.routes, one action of every agent at each step. Returns (steps, collisions): the
+        steps until the last route is done, and the times two agents ended a step in the same room or
+        swapped rooms (none, for routes planned by FleetPlanning)."""
+        steps = max(map(len, self.routes.values()), default=0)
+        collisions = 0
+        for t in range(steps):
+            before = {agent: agent.location for agent in self.routes}
+            for agent, route in self.routes.items():
+                if t < len(route):
+                    self.execute_action(agent, route[t])
+            after = [agent.location for agent in self.routes]
+            collisions += len(after) - len(set(after))
+            moves = {(before[agent], agent.location) for agent in self.routes if agent.location != before[agent]}
+            collisions += sum(1 for a, b in moves if (b, a) in moves) // 2
+        return steps, collisions
+
+    def read_env(self):
+        """ Nothing to read: the things are the environment."""
+        pass
+
+    def set_solution(self, path):
+        self.path = path
+
+    def set_routes(self, routes):
+        self.routes = routes
+
+    def display_explored(self, explored):
+        self.explored = explored
+
+
 if __name__ == "__main__":
     win = Tk()
     win.title("Searching Cleaning Robot")
@@ -545,4 +1695,9 @@ if __name__ == "__main__":
     searchTypeStr_dropdown = OptionMenu(frame, searchTypeStr, *searchTypes, command=env.setSearchEngine)
     searchTypeStr_dropdown.pack(side='left')
 
+    fleetSizeStr = StringVar(win)
+    fleetSizeStr.set('1')
+    fleetSize_dropdown = OptionMenu(frame, fleetSizeStr, *fleetSizes, command=env.setFleetSize)
+    fleetSize_dropdown.pack(side='left')
+
     win.mainloop()